@@ -0,0 +1,253 @@
+"""Микробенчмарки сериализаторов и вспомогательных функций API.
+
+Каждый бенчмарк получает набор тестовых данных Fixture и возвращает
+функцию без аргументов, время которой измеряется, или пару (prepare,
+run): prepare вызывается перед каждым запуском run и не измеряется.
+Данные создаются во временной тестовой базе (test_database), рабочая
+база не затрагивается.
+"""
+import base64
+import io
+import os
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import prefetch_related_objects
+from django.test import RequestFactory
+from django.test.utils import setup_databases, teardown_databases
+
+from PIL import Image
+from rest_framework.request import Request
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, RecipeTag, Tag
+from users.models import User, UserSubscription
+
+from .serializers import (
+    Base64ImageField,
+    RecipeReadSerializer,
+    RecipeWriteSerializer,
+    SubscriptionReadSerializer
+)
+from .utils import generate_shopping_cart, render_shopping_cart_pdf
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+
+    return register
+
+
+def measure(run, repeat, prepare=None):
+    """Время вызовов в секундах и пик выделенной памяти в байтах"""
+    prepare = prepare or (lambda: None)
+    prepare()
+    run()
+    timings = []
+    for _ in range(repeat):
+        prepare()
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    prepare()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'mean': statistics.mean(timings),
+        'stdev': statistics.stdev(timings) if len(timings) > 1 else 0,
+        'min': min(timings),
+        'peak_memory': peak,
+    }
+
+
+def run_benchmark(name, fixture, repeat):
+    setup = BENCHMARKS[name](fixture)
+    if isinstance(setup, tuple):
+        prepare, run = setup
+        return measure(run, repeat, prepare)
+    return measure(setup, repeat)
+
+
+@contextmanager
+def test_database():
+    """Временная тестовая база данных, удаляемая после бенчмарков"""
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+
+class Fixture:
+    """Пользователи, каталог и рецепты для бенчмарков"""
+
+    def __init__(
+        self, recipes=1000, ingredients=2000, authors=20,
+        tags=5, recipe_ingredients=8
+    ):
+        run = uuid4().hex[:8]
+        self.user = User.objects.create_user(
+            f'bench-{run}', f'bench-{run}@example.com',
+            first_name='Bench', last_name='User'
+        )
+        self.authors = User.objects.bulk_create([
+            User(
+                username=f'bench-{run}-{number}',
+                email=f'bench-{run}-{number}@example.com',
+                first_name='Bench', last_name=f'Author {number}',
+            )
+            for number in range(authors)
+        ])
+        UserSubscription.objects.bulk_create([
+            UserSubscription(user=self.user, subscription=author)
+            for author in self.authors
+        ])
+        self.tags = Tag.objects.bulk_create([
+            Tag(name=f'bench-{run}-{number}', color='#E26C2D',
+                slug=f'bench-{run}-{number}')
+            for number in range(tags)
+        ])
+        self.ingredients = Ingredient.objects.bulk_create([
+            Ingredient(name=f'bench-{run}-{number}', measurement_unit='г')
+            for number in range(ingredients)
+        ])
+        recipes = Recipe.objects.bulk_create([
+            Recipe(
+                author=self.authors[number % authors],
+                name=f'Рецепт {number}',
+                text='Описание рецепта. ' * 20,
+                cooking_time=number % 90 + 1,
+                image='recipes/images/bench.png',
+            )
+            for number in range(recipes)
+        ])
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient=self.ingredients[
+                    (number * recipe_ingredients + offset) % ingredients
+                ],
+                amount=offset + 1,
+            )
+            for number, recipe in enumerate(recipes)
+            for offset in range(recipe_ingredients)
+        ])
+        RecipeTag.objects.bulk_create([
+            RecipeTag(recipe=recipe, tag=self.tags[number % tags])
+            for number, recipe in enumerate(recipes)
+        ])
+        Recipe.objects.filter(
+            id__in=[recipe.id for recipe in recipes]
+        ).update_id_arrays()
+        self.recipes = list(Recipe.objects.filter(
+            id__in=[recipe.id for recipe in recipes]
+        ).favorite_and_shopping_cart(self.user.id).select_related('author'))
+        prefetch_related_objects(
+            self.recipes, 'recipe_tags__tag', 'ingredients__ingredient'
+        )
+
+    def request(self):
+        request = Request(RequestFactory().get(
+            '/api/recipes/', HTTP_HOST=settings.ALLOWED_HOSTS[0]
+        ))
+        request.user = self.user
+        return request
+
+
+def recipe_read(count):
+    """Полная сериализация рецептов без кэша фрагментов"""
+
+    def setup(fixture):
+        data = fixture.recipes[:count] if count > 1 else fixture.recipes[0]
+        context = {'request': fixture.request()}
+
+        def run():
+            RecipeReadSerializer(data, many=count > 1, context=context).data
+
+        return caches['fragments'].clear, run
+
+    return setup
+
+
+for count in (1, 100, 1000):
+    benchmark(f'recipe_read_{count}')(recipe_read(count))
+
+
+@benchmark('recipe_read_100_cached')
+def recipe_read_cached(fixture):
+    recipes = fixture.recipes[:100]
+    context = {'request': fixture.request()}
+
+    def run():
+        RecipeReadSerializer(recipes, many=True, context=context).data
+
+    return run
+
+
+@benchmark('subscription_read_20')
+def subscription_read(fixture):
+    context = {'request': fixture.request(), 'recipes_limit': '3'}
+
+    def run():
+        SubscriptionReadSerializer(
+            fixture.authors, many=True, context=context
+        ).data
+
+    return run
+
+
+@benchmark('validate_ingredients_1000')
+def validate_ingredients(fixture):
+    value = [
+        {'id': ingredient, 'amount': 10}
+        for ingredient in fixture.ingredients[:1000]
+    ]
+    serializer = RecipeWriteSerializer()
+    return lambda: serializer.validate_ingredients(value)
+
+
+@benchmark('base64_image_4mb')
+def base64_image(fixture):
+    image = Image.frombytes('RGB', (1200, 1200), os.urandom(1200 * 1200 * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    data = 'data:image/png;base64,' + base64.b64encode(
+        buffer.getvalue()
+    ).decode()
+    field = Base64ImageField()
+    return lambda: field.to_internal_value(data)
+
+
+def shopping_cart(fixture):
+    return [
+        {
+            'name': ingredient.name,
+            'measurement_unit': ingredient.measurement_unit,
+            'amount': number,
+        }
+        for number, ingredient in enumerate(fixture.ingredients[:1000])
+    ]
+
+
+@benchmark('generate_shopping_cart_1000')
+def generate_shopping_cart_text(fixture):
+    ingredients = shopping_cart(fixture)
+    return lambda: generate_shopping_cart(ingredients)
+
+
+@benchmark('shopping_cart_pdf_1000')
+def shopping_cart_pdf(fixture):
+    text = generate_shopping_cart(shopping_cart(fixture))
+    return lambda: render_shopping_cart_pdf(io.BytesIO(), text)
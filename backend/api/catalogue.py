@@ -0,0 +1,145 @@
+"""Готовые ответы со списками тегов и ингредиентов.
+
+JSON рендерится один раз после изменения каталога и сохраняется в
+CATALOGUE_DIR вместе со сжатыми вариантами, так что его видят все
+процессы. Файл <имя>.version содержит метку текущей версии: invalidate()
+заменяет ее, и следующий запрос собирает новый снимок. Снимок, собранный
+для старой метки, не будет отдан, даже если его запись завершилась уже
+после инвалидации.
+"""
+import gzip
+import hashlib
+import os
+from pathlib import Path
+from uuid import uuid4
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.module_loading import import_string
+
+import brotli
+
+from recipes.models import Ingredient, Tag
+
+from .renderers import FastJSONRenderer
+
+EXTENSIONS = {'': '.json', 'gzip': '.json.gz', 'br': '.json.br'}
+
+
+def write_atomic(path, data):
+    temporary = path.with_name(f'.{path.name}.{uuid4().hex}')
+    temporary.write_bytes(data)
+    os.replace(temporary, path)
+
+
+def accepted_encodings(request):
+    encodings = set()
+    for item in request.headers.get('Accept-Encoding', '').split(','):
+        encoding, _, params = item.strip().partition(';')
+        if params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00'):
+            encodings.add(encoding.strip().lower())
+    return encodings
+
+
+class CatalogueSnapshot:
+    """Снимок полного списка объектов справочника"""
+
+    def __init__(self, name, model, serializer_path):
+        self.name = name
+        self.model = model
+        # Сериализаторы импортируются при сборке: они сами используют
+        # версии снимков (см. fragments.py).
+        self.serializer_path = serializer_path
+        self.cached_version = None
+        self.bodies = None
+        self.etag = None
+
+    @property
+    def directory(self):
+        directory = Path(settings.CATALOGUE_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        return directory
+
+    def invalidate(self):
+        write_atomic(
+            self.directory / f'{self.name}.version', uuid4().hex.encode()
+        )
+
+    def version(self):
+        path = self.directory / f'{self.name}.version'
+        if not path.exists():
+            self.invalidate()
+        return path.read_text()
+
+    def build(self, version):
+        serializer_class = import_string(self.serializer_path)
+        body = FastJSONRenderer().render(serializer_class(
+            self.model.objects.all(), many=True
+        ).data)
+        bodies = {
+            '': body,
+            'gzip': gzip.compress(body, mtime=0),
+            'br': brotli.compress(body),
+        }
+        for encoding, data in bodies.items():
+            write_atomic(
+                self.directory / f'{self.name}-{version}'
+                f'{EXTENSIONS[encoding]}',
+                data
+            )
+        if self.version() == version:
+            for path in self.directory.glob(f'{self.name}-*'):
+                if not path.name.startswith(f'{self.name}-{version}.'):
+                    path.unlink(missing_ok=True)
+        return bodies
+
+    def load(self, version):
+        bodies = {}
+        for encoding, extension in EXTENSIONS.items():
+            path = self.directory / f'{self.name}-{version}{extension}'
+            if path.exists():
+                bodies[encoding] = path.read_bytes()
+        if len(bodies) < len(EXTENSIONS):
+            return None
+        return bodies
+
+    def get(self):
+        version = self.version()
+        if version != self.cached_version:
+            self.bodies = self.load(version) or self.build(version)
+            self.etag = '"{}"'.format(
+                hashlib.blake2b(self.bodies[''], digest_size=16).hexdigest()
+            )
+            self.cached_version = version
+        return self.bodies, self.etag
+
+    def response(self, request):
+        bodies, etag = self.get()
+        if etag in (
+            item.strip() for item in
+            request.headers.get('If-None-Match', '').split(',')
+        ):
+            response = HttpResponseNotModified()
+        else:
+            encodings = accepted_encodings(request)
+            encoding = next(
+                (item for item in ('br', 'gzip')
+                 if item in bodies and item in encodings),
+                ''
+            )
+            response = HttpResponse(
+                bodies[encoding], content_type='application/json'
+            )
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        response['Vary'] = 'Accept, Accept-Encoding'
+        return response
+
+
+tag_snapshot = CatalogueSnapshot(
+    'tags', Tag, 'api.serializers.TagSerializer'
+)
+ingredient_snapshot = CatalogueSnapshot(
+    'ingredients', Ingredient, 'api.serializers.IngredientSerializer'
+)
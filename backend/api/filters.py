@@ -1,17 +1,31 @@
-from django_filters import CharFilter, NumberFilter
+from django.db import connection
+from django.db.models import F
+
+from django_filters import CharFilter, ChoiceFilter, NumberFilter
 from django_filters.filters import ModelMultipleChoiceFilter
 from django_filters.rest_framework import FilterSet
 
+import backend.constants as const
 from recipes.models import Ingredient, Recipe, Tag
 
+FACETS = ('tags', 'cooking_time')
+
 
 class RecipeFilter(FilterSet):
     """Фильтр для рецептов"""
 
     tags = ModelMultipleChoiceFilter(
         queryset=Tag.objects.all(),
-        field_name='tags__slug',
-        to_field_name='slug'
+        to_field_name='slug',
+        method='filter_tags'
+    )
+    ingredients = ModelMultipleChoiceFilter(
+        queryset=Ingredient.objects.all(),
+        method='filter_ingredients'
+    )
+    exclude_ingredients = ModelMultipleChoiceFilter(
+        queryset=Ingredient.objects.all(),
+        method='filter_exclude_ingredients'
     )
     is_favorited = NumberFilter(
         field_name='is_favorited', method='filter_in'
@@ -19,10 +33,40 @@ class RecipeFilter(FilterSet):
     is_in_shopping_cart = NumberFilter(
         field_name='is_in_shopping_cart', method='filter_in'
     )
+    ordering = ChoiceFilter(
+        choices=(('trending', 'trending'), ('popular', 'popular')),
+        method='filter_ordering'
+    )
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
+        fields = (
+            'author',
+            'tags',
+            'ingredients',
+            'exclude_ingredients',
+            'is_favorited',
+            'is_in_shopping_cart',
+        )
+
+    def filter_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(tag_ids__overlap=[tag.id for tag in value])
+
+    def filter_ingredients(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(
+            ingredient_ids__contains=[ingredient.id for ingredient in value]
+        )
+
+    def filter_exclude_ingredients(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.exclude(
+            ingredient_ids__overlap=[ingredient.id for ingredient in value]
+        )
 
     def filter_in(self, queryset, name, value):
         if value == 0:
@@ -30,6 +74,80 @@ class RecipeFilter(FilterSet):
         lookup = '__'.join([name, 'exact'])
         return queryset.filter(**{lookup: True})
 
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by(
+            F('__'.join(['score', value])).desc(nulls_last=True), '-id'
+        )
+
+
+def cooking_time_buckets():
+    """Границы интервалов времени приготовления и их названия"""
+    lower = const.COOKING_TIME_MIN_VALUE
+    buckets = []
+    for upper in const.COOKING_TIME_FACET_BOUNDS:
+        buckets.append((upper, f'{lower}-{upper}'))
+        lower = upper + 1
+    buckets.append((None, f'{lower}+'))
+    return buckets
+
+
+def get_facets(queryset, tag_ids, facets):
+    """Количество рецептов по тегам и времени приготовления.
+
+    queryset отфильтрован по всем параметрам, кроме тегов: счетчик тега
+    показывает, сколько рецептов добавит его выбор. Интервалы времени
+    считаются с учетом выбранных тегов tag_ids. Все фасеты считаются
+    одним запросом. Фасет тегов ключуется по id тега (slug может быть
+    пустым и не уникален), slug возвращается рядом со счетчиком.
+    """
+    sql, params = queryset.order_by().values(
+        'id', 'tag_ids', 'cooking_time'
+    ).query.sql_with_params()
+    parts = []
+    part_params = []
+    if 'tags' in facets:
+        parts.append(
+            "SELECT 'tags', tag.slug, tag.id, COUNT(base.id) "
+            f"FROM {Tag._meta.db_table} tag "
+            "LEFT JOIN base ON tag.id = ANY(base.tag_ids) "
+            "GROUP BY tag.id"
+        )
+    if 'cooking_time' in facets:
+        buckets = cooking_time_buckets()
+        cases = ' '.join(
+            'WHEN cooking_time <= %s THEN %s' for upper, _ in buckets if upper
+        )
+        parts.append(
+            f"SELECT 'cooking_time', CASE {cases} ELSE %s END, NULL, COUNT(*) "
+            "FROM base "
+            "WHERE cardinality(%s::bigint[]) = 0 OR tag_ids && %s::bigint[] "
+            "GROUP BY 2"
+        )
+        for upper, label in buckets[:-1]:
+            part_params += [upper, label]
+        part_params += [buckets[-1][1], tag_ids, tag_ids]
+
+    result = {}
+    if 'tags' in facets:
+        result['tags'] = {}
+    if 'cooking_time' in facets:
+        result['cooking_time'] = {
+            label: 0 for _, label in cooking_time_buckets()
+        }
+    if not parts:
+        return result
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'WITH base AS ({sql}) ' + ' UNION ALL '.join(parts),
+            (*params, *part_params)
+        )
+        for facet, key, tag_id, count in cursor.fetchall():
+            if facet == 'tags':
+                result[facet][tag_id] = {'slug': key, 'count': count}
+            else:
+                result[facet][key] = count
+    return result
+
 
 class IngredientFilter(FilterSet):
     """Фильтр для ингредиентов"""
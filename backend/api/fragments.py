@@ -0,0 +1,54 @@
+"""Кэш общей для всех пользователей части ответа с рецептом.
+
+Ключ фрагмента содержит время изменения рецепта, контрольную сумму
+профиля автора и версии каталога тегов и ингредиентов, поэтому
+устаревший фрагмент просто перестает запрашиваться.
+"""
+import zlib
+
+from django.core.cache import caches
+from django.db.models import prefetch_related_objects
+
+import backend.constants as const
+
+from .catalogue import ingredient_snapshot, tag_snapshot
+
+
+def fragment_key(recipe, catalogue_version):
+    author = recipe.author
+    profile = zlib.crc32('\0'.join((
+        author.email, author.username, author.first_name, author.last_name
+    )).encode())
+    return (
+        f'recipe:{recipe.id}:{recipe.updated.timestamp()}:'
+        f'{profile:x}:{catalogue_version}'
+    )
+
+
+def get_fragments(recipes, serializer_class):
+    """Фрагменты рецептов по id, недостающие рендерятся одним пакетом"""
+    cache = caches['fragments']
+    catalogue_version = (
+        f'{tag_snapshot.version()}:{ingredient_snapshot.version()}'
+    )
+    keys = {
+        recipe.id: fragment_key(recipe, catalogue_version)
+        for recipe in recipes
+    }
+    fragments = cache.get_many(keys.values())
+    missing = [
+        recipe for recipe in recipes if keys[recipe.id] not in fragments
+    ]
+    if missing:
+        prefetch_related_objects(
+            missing, 'recipe_tags__tag', 'ingredients__ingredient'
+        )
+        rendered = {
+            keys[recipe.id]: serializer_class(recipe).data
+            for recipe in missing
+        }
+        cache.set_many(rendered, const.RECIPE_FRAGMENT_CACHE_TIMEOUT)
+        fragments.update(rendered)
+    return {
+        recipe_id: fragments[key] for recipe_id, key in keys.items()
+    }
@@ -0,0 +1,89 @@
+import json
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmarks import BENCHMARKS, Fixture, run_benchmark, test_database
+
+
+class Command(BaseCommand):
+    help = (
+        "Run microbenchmarks of serializers and helpers against fixture "
+        "data created in a temporary test database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "benchmarks", nargs="*",
+            help=f"Benchmarks to run (all by default): {', '.join(BENCHMARKS)}"
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=20,
+            help="Number of timed runs of each benchmark."
+        )
+        parser.add_argument(
+            "--output", help="Save results as JSON to this file."
+        )
+        parser.add_argument(
+            "--compare", help="Compare with results saved by --output."
+        )
+        parser.add_argument(
+            "--threshold", type=float, default=10,
+            help="Mean time increase in percent reported as a regression."
+        )
+
+    def handle(self, *args, **options):
+        names = options["benchmarks"] or list(BENCHMARKS)
+        unknown = set(names) - set(BENCHMARKS)
+        if unknown:
+            raise CommandError(
+                f"Unknown benchmarks: {', '.join(sorted(unknown))}."
+            )
+        if options["repeat"] < 1:
+            raise CommandError("--repeat must be positive.")
+        baseline = {}
+        if options["compare"]:
+            with open(options["compare"], encoding='utf-8') as file:
+                baseline = json.load(file)['benchmarks']
+
+        results = {}
+        with test_database():
+            fixture = Fixture()
+            for name in names:
+                results[name] = run_benchmark(
+                    name, fixture, options["repeat"]
+                )
+
+        self.stdout.write(
+            f"{'benchmark':<32}{'mean ms':>10}{'stdev ms':>10}"
+            f"{'min ms':>10}{'peak KiB':>10}"
+        )
+        regressions = []
+        for name, stats in results.items():
+            line = (
+                f"{name:<32}{stats['mean'] * 1000:>10.2f}"
+                f"{stats['stdev'] * 1000:>10.2f}{stats['min'] * 1000:>10.2f}"
+                f"{stats['peak_memory'] / 1024:>10.0f}"
+            )
+            if name in baseline:
+                change = (stats['mean'] / baseline[name]['mean'] - 1) * 100
+                line += f"  {change:+.0f}%"
+                if change > options["threshold"]:
+                    regressions.append(name)
+            self.stdout.write(line)
+
+        if options["output"]:
+            with open(options["output"], 'w', encoding='utf-8') as file:
+                json.dump({
+                    'started': datetime.now().isoformat(timespec='seconds'),
+                    'repeat': options["repeat"],
+                    'benchmarks': results,
+                }, file, indent=2)
+            self.stdout.write(
+                self.style.SUCCESS(f"Results saved to {options['output']}.")
+            )
+        if regressions:
+            raise CommandError(
+                f"Slower than the baseline by more than "
+                f"{options['threshold']:.0f}%: {', '.join(regressions)}."
+            )
@@ -0,0 +1,90 @@
+import gzip
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rest_framework.renderers import JSONRenderer
+
+import backend.constants as const
+from api.benchmarks import Fixture, measure, test_database
+from api.renderers import FastJSONRenderer, MessagePackRenderer
+from api.serializers import (
+    IngredientSerializer,
+    RecipeReadSerializer,
+    SubscriptionReadSerializer
+)
+
+RENDERERS = {
+    'json': JSONRenderer,
+    'fast_json': FastJSONRenderer,
+    'msgpack': MessagePackRenderer,
+}
+
+
+def get_payloads(fixture):
+    """Данные ответов крупнейших эндпоинтов"""
+    context = {'request': fixture.request(), 'recipes_limit': None}
+    return {
+        'ingredients': IngredientSerializer(
+            fixture.ingredients, many=True
+        ).data,
+        'recipes_page': {
+            'count': len(fixture.recipes),
+            'next': None,
+            'previous': None,
+            'results': RecipeReadSerializer(
+                fixture.recipes[:const.PAGE_MAX_SIZE],
+                many=True, context=context
+            ).data,
+        },
+        'recipe': RecipeReadSerializer(
+            fixture.recipes[0], context=context
+        ).data,
+        'subscriptions': SubscriptionReadSerializer(
+            fixture.authors, many=True, context=context
+        ).data,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare response size and rendering time of the JSON and "
+        "MessagePack renderers with the default DRF JSONRenderer"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--repeat", type=int, default=50,
+            help="Number of timed renders of each payload."
+        )
+
+    def handle(self, *args, **options):
+        if options["repeat"] < 1:
+            raise CommandError("--repeat must be positive.")
+        with test_database():
+            payloads = get_payloads(Fixture())
+
+        self.stdout.write(
+            f"{'payload':<16}{'renderer':<12}{'bytes':>10}{'gzip':>9}"
+            f"{'mean ms':>10}{'bytes':>9}{'cpu':>7}"
+        )
+        for name, data in payloads.items():
+            baseline = None
+            for label, renderer_class in RENDERERS.items():
+                renderer = renderer_class()
+                body = renderer.render(data)
+                stats = measure(
+                    lambda: renderer.render(data), options["repeat"]
+                )
+                line = (
+                    f"{name:<16}{label:<12}{len(body):>10}"
+                    f"{len(gzip.compress(body)):>9}"
+                    f"{stats['mean'] * 1000:>10.2f}"
+                )
+                if baseline:
+                    line += (
+                        f"{(len(body) / baseline[0] - 1) * 100:>+8.0f}%"
+                        f"{(stats['mean'] / baseline[1] - 1) * 100:>+6.0f}%"
+                    )
+                else:
+                    baseline = len(body), stats['mean']
+                self.stdout.write(line)
@@ -0,0 +1,120 @@
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+import backend.constants as const
+
+LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+FIRST_PARTY = ('backend', 'api', 'recipes', 'users')
+STARTUP = (
+    'import django; django.setup(); '
+    'from importlib import import_module; '
+    'from django.conf import settings; '
+    'import_module(settings.ROOT_URLCONF); '
+    'import_module(settings.WSGI_APPLICATION.rsplit(".", 1)[0])'
+)
+
+
+def parse_import_time(output):
+    """Собственное и суммарное время импорта модулей в микросекундах"""
+    modules = {}
+    for line in output.splitlines():
+        match = LINE.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            modules[name] = (int(own), int(cumulative), len(indent) // 2)
+    return modules
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the import time of the application at startup and report "
+        "the cost per module; fail if it exceeds the budget"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--repeat", type=int, default=3,
+            help="Number of runs; the fastest time of each module is used."
+        )
+        parser.add_argument(
+            "--limit", type=int, default=20,
+            help="Number of third-party packages to list."
+        )
+        parser.add_argument(
+            "--budget", type=float, default=settings.IMPORT_TIME_BUDGET,
+            help="Maximum total import time in milliseconds (0 to disable)."
+        )
+
+    def measure(self):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', STARTUP],
+            capture_output=True, text=True, cwd=settings.BASE_DIR,
+            env=os.environ.copy(),
+        )
+        if result.returncode:
+            raise CommandError(
+                f"Application startup failed:\n{result.stderr[-2000:]}"
+            )
+        return parse_import_time(result.stderr)
+
+    def handle(self, *args, **options):
+        runs = [self.measure() for _ in range(max(options["repeat"], 1))]
+        modules = {}
+        for name in runs[0]:
+            timings = [run[name] for run in runs if name in run]
+            modules[name] = (
+                min(own for own, _, _ in timings),
+                min(cumulative for _, cumulative, _ in timings),
+                timings[0][2],
+            )
+        total = sum(
+            cumulative for _, cumulative, depth in modules.values()
+            if depth == 0
+        ) / 1000
+
+        first_party = sorted(
+            (
+                (name, own, cumulative)
+                for name, (own, cumulative, _) in modules.items()
+                if name.split('.')[0] in FIRST_PARTY
+            ),
+            key=lambda module: -module[2]
+        )
+        packages = defaultdict(int)
+        for name, (_, cumulative, depth) in modules.items():
+            if depth == 0:
+                packages[name.split('.')[0]] += cumulative
+
+        self.stdout.write(f"Total import time: {total:.1f} ms")
+        self.stdout.write(f"{'module':<52}{'self ms':>10}{'cumul. ms':>11}")
+        for name, own, cumulative in first_party:
+            self.stdout.write(
+                f"{name:<52}{own / 1000:>10.1f}{cumulative / 1000:>11.1f}"
+            )
+        self.stdout.write(f"\n{'top-level package':<52}{'cumul. ms':>21}")
+        for name, cumulative in sorted(
+            packages.items(), key=lambda package: -package[1]
+        )[:options["limit"]]:
+            self.stdout.write(f"{name:<52}{cumulative / 1000:>21.1f}")
+
+        problems = [
+            f"{name} is imported at startup"
+            for name in const.LAZY_IMPORT_MODULES
+            if name in modules
+        ]
+        if options["budget"] and total > options["budget"]:
+            problems.append(
+                f"import time {total:.1f} ms exceeds the budget "
+                f"of {options['budget']:.0f} ms"
+            )
+        if problems:
+            raise CommandError(
+                "Import budget exceeded: " + "; ".join(problems)
+            )
+        self.stdout.write(self.style.SUCCESS("Import time is within budget."))
@@ -0,0 +1,393 @@
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from datetime import datetime
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+COLLECTION = (
+    settings.BASE_DIR.parent
+    / 'postman-collection'
+    / 'diploma.postman_collection.json'
+)
+VARIABLE = re.compile(r'{{(\w+)}}')
+
+SETUP = (
+    'create_first_user',
+    'get_token_for_first_user',
+)
+SCENARIOS = {
+    'browse': (40, (
+        'get_recipes_list // User',
+        'get_recipe_detail // User',
+        'get_tag_list // User',
+        'get_ingredients_list_with_name_filter // User',
+    )),
+    'filter': (20, (
+        'get_recipes_list_with_two_tags_param // User',
+        'get_recipes_list_with_author_param // User',
+        'get_recipes_list_with_is_favorited_param // User',
+    )),
+    'favorite': (15, (
+        'add_to_favorite // User',
+        'get_recipes_list_with_is_favorited_param // User',
+        'remove_from_favorite // User',
+    )),
+    'cart': (10, (
+        'add_to_shopping_cart // User',
+        'get_recipes_list_with_is_in_shopping_cart_param // User',
+        'remove_from_shopping_cart // User',
+    )),
+    'download': (5, (
+        'add_to_shopping_cart // User',
+        'download_shopping_cart // User',
+        'remove_from_shopping_cart // User',
+    )),
+    'subscribe': (10, (
+        'create_subscription // User',
+        'get_subscription_list // User',
+        'delete_first_subscription // User',
+    )),
+}
+
+
+def load_collection(path):
+    """Запросы коллекции Postman по имени"""
+    with open(path, encoding='utf-8') as file:
+        collection = json.load(file)
+    requests = {}
+
+    def walk(items):
+        for item in items:
+            if 'item' in item:
+                walk(item['item'])
+            elif item['name'] not in requests:
+                request = item['request']
+                url = request['url']
+                requests[item['name']] = {
+                    'method': request['method'],
+                    'url': url['raw'] if isinstance(url, dict) else url,
+                    'body': request.get('body', {}).get('raw') or None,
+                    'auth': not item['name'].endswith('// No Auth'),
+                }
+
+    walk(collection['item'])
+    return requests
+
+
+def percentile(values, rank):
+    return values[min(len(values) - 1, int(len(values) * rank / 100))]
+
+
+class VirtualUser:
+    """Пользователь, выполняющий сценарии в отдельном потоке"""
+
+    def __init__(self, requests, variables):
+        self.requests = requests
+        self.variables = variables
+        self.token = None
+        self.id = None
+
+    def substitute(self, template, quote):
+        def replace(match):
+            value = self.variables[match.group(1)]
+            if quote:
+                return json.dumps(value)
+            return urllib.parse.quote(str(value), safe=':/')
+
+        return VARIABLE.sub(replace, template)
+
+    def call(self, name):
+        request = self.requests[name]
+        url = self.substitute(request['url'], quote=False)
+        body = request['body'] and self.substitute(request['body'], True)
+        headers = {'Content-Type': 'application/json'}
+        if self.token and request['auth']:
+            headers['Authorization'] = f'Token {self.token}'
+        http_request = urllib.request.Request(
+            url,
+            data=body.encode() if body else None,
+            headers=headers,
+            method=request['method'],
+        )
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(http_request, timeout=60) as response:
+                status, content = response.status, response.read()
+        except urllib.error.HTTPError as error:
+            status, content = error.code, error.read()
+        except OSError:
+            status, content = 0, b''
+        return status, content, time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay weighted scenarios from the Postman collection against "
+        "a running server and report latency percentiles per endpoint"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url", default="http://127.0.0.1:8000",
+            help="Base URL of the server under test."
+        )
+        parser.add_argument(
+            "--start-server", action="store_true",
+            help="Start gunicorn locally for the duration of the run."
+        )
+        parser.add_argument(
+            "--workers", type=int, default=2,
+            help="Number of gunicorn workers with --start-server."
+        )
+        parser.add_argument(
+            "--duration", type=float, default=30,
+            help="Duration of the run in seconds."
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=10,
+            help="Number of concurrent virtual users."
+        )
+        parser.add_argument(
+            "--collection", default=str(COLLECTION),
+            help="Path to the Postman collection."
+        )
+        parser.add_argument(
+            "--output", help="Save results as JSON to this file."
+        )
+        parser.add_argument(
+            "--compare", help="Compare with results saved by --output."
+        )
+        parser.add_argument("--seed", type=int, help="Random seed.")
+
+    def start_server(self, url, workers):
+        host_port = url.split('://', 1)[-1].rstrip('/')
+        server = subprocess.Popen(
+            [
+                sys.executable, '-m', 'gunicorn', 'backend.wsgi',
+                '--bind', host_port, '--workers', str(workers),
+            ],
+            cwd=settings.BASE_DIR,
+            # Все виртуальные пользователи приходят с одного адреса,
+            # лимиты запросов превратили бы прогон в быстрые ответы 429.
+            env={**os.environ, 'THROTTLE_ENABLED': 'False'},
+        )
+        for _ in range(60):
+            try:
+                urllib.request.urlopen(f'{url}/api/tags/', timeout=1)
+                return server
+            except OSError:
+                time.sleep(0.5)
+        server.terminate()
+        raise CommandError(f"Server at {url} did not start.")
+
+    def setup_users(self, requests, base_url, count):
+        run = uuid4().hex[:8]
+        users = []
+        for number in range(count):
+            username = f'load-{run}-{number}'
+            user = VirtualUser(requests, {
+                'baseUrl': base_url,
+                'email': f'{username}@example.com',
+                'username': username,
+                'password': f'{uuid4().hex}!Aa1',
+            })
+            for name in SETUP:
+                status, content, _ = user.call(name)
+                if status >= 300:
+                    raise CommandError(
+                        f"{name} failed with {status}: {content[:200]}"
+                    )
+            user.token = json.loads(content)['auth_token']
+            users.append(user)
+
+        status, content, _ = users[0].call('get_ingredients_list // User')
+        ingredients = json.loads(content)
+        status, content, _ = users[0].call('get_tag_list // User')
+        tags = json.loads(content)
+        if len(ingredients) < 2 or len(tags) < 3:
+            raise CommandError(
+                "The database needs at least 2 ingredients and 3 tags."
+            )
+        ids = []
+        for user in users:
+            user.variables.update({
+                'firstIndredientId': ingredients[0]['id'],
+                'secondIndredientId': ingredients[1]['id'],
+                'firstIngredientAmount': 10,
+                'secondIngredientAmount': 20,
+                'ingredientNameFirstLatter': ingredients[0]['name'][:1],
+                'firstTagId': tags[0]['id'],
+                'secondTagId': tags[1]['id'],
+                'secondTagSlug': tags[1]['slug'],
+                'thirdTagSlug': tags[2]['slug'],
+            })
+            status, content, _ = user.call(
+                'create_first_recipe // Second User'
+            )
+            if status != 201:
+                raise CommandError(
+                    f"Recipe creation failed with {status}: {content[:200]}"
+                )
+            recipe = json.loads(content)
+            user.id = recipe['author']['id']
+            ids.append((user.id, recipe['id']))
+        return users, ids
+
+    def run_user(self, user, ids, deadline, results):
+        while time.monotonic() < deadline:
+            name = random.choices(
+                list(SCENARIOS),
+                weights=[weight for weight, _ in SCENARIOS.values()]
+            )[0]
+            author_id, recipe_id = random.choice(
+                [item for item in ids if item[0] != user.id] or ids
+            )
+            user.variables.update({
+                'userId': author_id,
+                'thirdUserId': author_id,
+                'firstRecipeId': recipe_id,
+            })
+            for step in SCENARIOS[name][1]:
+                status, _, elapsed = user.call(step)
+                results.append((step.split(' //')[0], status, elapsed))
+
+    def report(self, results, duration):
+        """Статистика по эндпоинтам.
+
+        Ответы 429 считаются отдельно и не входят в задержки: быстрые
+        отказы лимитов занизили бы их.
+        """
+        by_endpoint = defaultdict(list)
+        counts = defaultdict(lambda: defaultdict(int))
+        for endpoint, status, elapsed in results:
+            counts[endpoint]['count'] += 1
+            if status == 429:
+                counts[endpoint]['throttled'] += 1
+                continue
+            by_endpoint[endpoint].append(elapsed)
+            if status == 0 or status >= 500:
+                counts[endpoint]['errors'] += 1
+            elif status >= 400:
+                counts[endpoint]['client_errors'] += 1
+        endpoints = {}
+        for endpoint in sorted(counts):
+            latencies = sorted(by_endpoint[endpoint]) or [0]
+            endpoints[endpoint] = {
+                'count': counts[endpoint]['count'],
+                'errors': counts[endpoint]['errors'],
+                'client_errors': counts[endpoint]['client_errors'],
+                'throttled': counts[endpoint]['throttled'],
+                'throughput': counts[endpoint]['count'] / duration,
+                'mean': sum(latencies) / len(latencies),
+                'p50': percentile(latencies, 50),
+                'p95': percentile(latencies, 95),
+                'p99': percentile(latencies, 99),
+            }
+        return endpoints
+
+    def print_report(self, summary, baseline):
+        self.stdout.write(
+            f"Requests: {summary['requests']}, "
+            f"throughput: {summary['throughput']:.1f} req/s, "
+            f"errors: {summary['errors']}, "
+            f"4xx: {summary['client_errors']}, "
+            f"429: {summary['throttled']}"
+        )
+        self.stdout.write(
+            f"{'endpoint':<52}{'count':>7}{'err':>5}{'4xx':>5}{'429':>5}"
+            f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+        )
+        for endpoint, stats in summary['endpoints'].items():
+            line = (
+                f"{endpoint:<52}{stats['count']:>7}{stats['errors']:>5}"
+                f"{stats['client_errors']:>5}{stats['throttled']:>5}"
+                f"{stats['p50'] * 1000:>9.1f}{stats['p95'] * 1000:>9.1f}"
+                f"{stats['p99'] * 1000:>9.1f}"
+            )
+            before = baseline and baseline['endpoints'].get(
+                endpoint, {}
+            ).get('p95')
+            if before and stats['p95']:
+                line += f"  p95 {(stats['p95'] / before - 1) * 100:+.0f}%"
+            self.stdout.write(line)
+
+    def handle(self, *args, **options):
+        if options["seed"] is not None:
+            random.seed(options["seed"])
+        base_url = options["url"].rstrip('/')
+        requests = load_collection(options["collection"])
+        baseline = None
+        if options["compare"]:
+            with open(options["compare"], encoding='utf-8') as file:
+                baseline = json.load(file)
+
+        server = None
+        if options["start_server"]:
+            server = self.start_server(base_url, options["workers"])
+        try:
+            users, ids = self.setup_users(
+                requests, base_url, options["concurrency"]
+            )
+            results = []
+            deadline = time.monotonic() + options["duration"]
+            threads = [
+                threading.Thread(
+                    target=self.run_user, args=(user, ids, deadline, results)
+                )
+                for user in users
+            ]
+            started = time.monotonic()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            duration = time.monotonic() - started
+        finally:
+            if server:
+                server.terminate()
+                server.wait()
+
+        endpoints = self.report(results, duration)
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                capture_output=True, text=True, cwd=settings.BASE_DIR
+            ).stdout.strip()
+        except OSError:
+            commit = ''
+        summary = {
+            'commit': commit,
+            'started': datetime.now().isoformat(timespec='seconds'),
+            'duration': duration,
+            'concurrency': options["concurrency"],
+            'requests': len(results),
+            'throughput': len(results) / duration,
+            'endpoints': endpoints,
+        }
+        for key in ('errors', 'client_errors', 'throttled'):
+            summary[key] = sum(stats[key] for stats in endpoints.values())
+        self.print_report(summary, baseline)
+        if options["output"]:
+            with open(options["output"], 'w', encoding='utf-8') as file:
+                json.dump(summary, file, ensure_ascii=False, indent=2)
+            self.stdout.write(
+                self.style.SUCCESS(f"Results saved to {options['output']}.")
+            )
+        if summary['throttled']:
+            raise CommandError(
+                f"{summary['throttled']} requests were throttled (429), "
+                "latencies are not representative. Disable throttling "
+                "(THROTTLE_ENABLED=False) on the server under test."
+            )
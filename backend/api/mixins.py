@@ -1,5 +1,16 @@
+import logging
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+
+from psycopg2 import errorcodes
+from rest_framework import status
 from rest_framework.response import Response
 
+from backend import metrics
+
+logger = logging.getLogger(__name__)
+
 
 class PatchModelMixin:
     """Обновление данных модели (только PATCH метод)"""
@@ -16,3 +27,93 @@ class PatchModelMixin:
 
     def perform_update(self, serializer):
         serializer.save()
+
+
+class CatalogueSnapshotMixin:
+    """Полный список без фильтров отдается из готового снимка"""
+
+    snapshot = None
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params or request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+        return self.snapshot.response(request)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryLimits:
+    """Ограничения SQL-запросов одного запроса к API.
+
+    statement_timeout устанавливается перед первым SQL-запросом, так что
+    ответы, не обращающиеся к базе, не платят за лишний запрос.
+    """
+
+    def __init__(self, timeout, budget):
+        self.timeout = timeout
+        self.budget = budget
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        if self.budget and self.count > self.budget:
+            raise QueryBudgetExceeded(
+                f'выполнено больше {self.budget} SQL-запросов'
+            )
+        if self.timeout and self.count == 1:
+            with context['connection'].connection.cursor() as cursor:
+                cursor.execute(
+                    'SET LOCAL statement_timeout = %s', [self.timeout]
+                )
+        return execute(sql, params, many, context)
+
+
+class QueryLimitMixin:
+    """Ограничение времени SQL-запросов и их числа для действий view.
+
+    statement_timeouts (мс) и query_budgets задаются по имени действия
+    (или HTTP-метода для APIView), остальные действия получают значения
+    STATEMENT_TIMEOUT и QUERY_BUDGET из настроек; 0 снимает ограничение.
+    Обработчик выполняется в транзакции, чтобы SET LOCAL действовал
+    только на этот запрос. При превышении ответ 503.
+    """
+
+    statement_timeouts = {}
+    query_budgets = {}
+
+    def get_limits_action(self, request):
+        method = request.method.lower()
+        return (getattr(self, 'action_map', None) or {}).get(method, method)
+
+    def dispatch(self, request, *args, **kwargs):
+        action = self.get_limits_action(request)
+        timeout = self.statement_timeouts.get(
+            action, settings.STATEMENT_TIMEOUT
+        )
+        budget = self.query_budgets.get(action, settings.QUERY_BUDGET)
+        if not timeout and not budget:
+            return super().dispatch(request, *args, **kwargs)
+        with transaction.atomic(), connection.execute_wrapper(
+            QueryLimits(timeout, budget)
+        ):
+            return super().dispatch(request, *args, **kwargs)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, QueryBudgetExceeded):
+            reason = 'query_budget'
+        elif isinstance(exc, OperationalError) and getattr(
+            exc.__cause__, 'pgcode', None
+        ) == errorcodes.QUERY_CANCELED:
+            reason = 'statement_timeout'
+        else:
+            return super().handle_exception(exc)
+        transaction.set_rollback(True)
+        view = f'{type(self).__name__}.{self.get_limits_action(self.request)}'
+        logger.warning('%s: %s (%s)', view, reason, exc)
+        metrics.inc('db_limit_exceeded_total', view=view, reason=reason)
+        return Response(
+            {"errors": "Запрос выполняется слишком долго, повторите позже."},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
@@ -1,7 +1,78 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    Cursor,
+    CursorPagination,
+    PageNumberPagination
+)
+
+import backend.constants as const
+from recipes.feed import feed_recipe_ids
 
 
 class CustomPagination(PageNumberPagination):
 
     page_size = 6
     page_size_query_param = 'limit'
+    max_page_size = const.PAGE_MAX_SIZE
+
+
+class FeedPagination(CursorPagination):
+    """Keyset-пагинация ленты пользователя по id рецепта.
+
+    Страница собирается из записей ленты и рецептов популярных авторов
+    функцией feed_recipe_ids, поэтому queryset только загружает рецепты
+    выбранной страницы.
+    """
+
+    page_size = const.FEED_PAGE_SIZE
+    page_size_query_param = 'limit'
+    max_page_size = const.PAGE_MAX_SIZE
+    ordering = '-id'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        self.reverse = bool(cursor and cursor.reverse)
+        self.position = None
+        if cursor and cursor.position is not None:
+            try:
+                self.position = int(cursor.position)
+            except ValueError:
+                raise NotFound(self.invalid_cursor_message)
+        recipe_ids = feed_recipe_ids(
+            request.user, self.position, self.reverse, self.page_size + 1
+        )
+        has_more = len(recipe_ids) > self.page_size
+        recipe_ids = recipe_ids[:self.page_size]
+        if self.reverse:
+            recipe_ids.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.position is not None
+        self.recipe_ids = recipe_ids
+        recipes = queryset.in_bulk(recipe_ids)
+        return [
+            recipes[recipe_id] for recipe_id in recipe_ids
+            if recipe_id in recipes
+        ]
+
+    def get_link(self, reverse, position):
+        return self.encode_cursor(Cursor(
+            offset=0, reverse=reverse, position=str(position)
+        ))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if self.recipe_ids:
+            return self.get_link(False, self.recipe_ids[-1])
+        return self.get_link(False, self.position)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.recipe_ids:
+            return self.get_link(True, self.recipe_ids[0])
+        return self.get_link(True, self.position)
@@ -0,0 +1,45 @@
+"""Быстрый JSON (orjson) и MessagePack для ответов API.
+
+Даты и прочие типы, которые не сериализуются напрямую, проходят через
+JSONEncoder DRF, как в стандартном JSONRenderer. Отличаются только
+числа с плавающей точкой: NaN и бесконечность orjson выводит как null
+(JSONRenderer выдает ошибку), а большие числа записывает без знака
+степени (1e20 вместо 1e+20).
+"""
+import msgpack
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+encoder = JSONEncoder()
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer на orjson; с отступами рендерит стандартный"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type or '', renderer_context or {}):
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+        return orjson.dumps(
+            data,
+            default=encoder.default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        )
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(
+            data, default=encoder.default, use_bin_type=True, datetime=False
+        )
@@ -1,14 +1,18 @@
 import base64
-import os
+import io
+from collections.abc import Mapping
 from uuid import uuid4
 
 from django.contrib.auth.hashers import make_password
 from django.core.files.base import ContentFile
+from django.db import transaction
 
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
 
 import backend.constants as const
+from recipes.feed import fan_out_recipe, fan_out_recipes
+from recipes.images import delete_image_on_commit, save_image_on_commit
 from recipes.models import (
     Favorite,
     Ingredient,
@@ -18,12 +22,20 @@ from recipes.models import (
     ShoppingCart,
     Tag
 )
-from users.models import User, UserSubscription
+from users.models import User
+
+from .fragments import get_fragments
+from .utils import get_subscribed_ids
 
 ERROR_MESSAGES = {
     ShoppingCart: 'Этот рецепт уже добавлен в список покупок.',
     Favorite: 'Этот рецепт уже добавлен в избранное.'
 }
+MISSING_ERROR_MESSAGES = {
+    ShoppingCart: 'Этого рецепта нет в списке покупок.',
+    Favorite: 'Этого рецепта нет в избранном.'
+}
+RECIPE_NOT_FOUND_ERROR = 'Некорректный номер рецепта.'
 
 
 class Base64ImageField(serializers.ImageField):
@@ -33,6 +45,16 @@ class Base64ImageField(serializers.ImageField):
             ext = format.split('/')[-1]
             filename = str(uuid4())[:12] + '.' + ext
             data = ContentFile(base64.b64decode(imgstr), name=filename)
+        elif isinstance(data, bytes):
+            # Изображение без base64 из тела запроса в MessagePack.
+            # Pillow загружается только здесь: он не нужен при запуске.
+            from PIL import Image
+
+            try:
+                ext = Image.open(io.BytesIO(data)).format.lower()
+            except (OSError, AttributeError):
+                ext = 'img'
+            data = ContentFile(data, name=str(uuid4())[:12] + '.' + ext)
 
         return super().to_internal_value(data)
 
@@ -84,12 +106,10 @@ class UserSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
     def get_is_subscribed(self, obj):
-        current_user = self.context['request'].user
+        request = self.context['request']
         return (
-            current_user.is_authenticated
-            and UserSubscription.objects.filter(
-                user=current_user, subscription=obj
-            ).exists()
+            request.user.is_authenticated
+            and obj.id in get_subscribed_ids(request)
         )
 
 
@@ -130,59 +150,23 @@ class SubscriptionReadSerializer(UserSerializer):
         )
 
     def get_recipes(self, obj):
-        recipes_limit = self.context['recipes_limit']
-        if recipes_limit:
-            recipes_limit = int(recipes_limit)
-        return RecipeSubscriptionSerializer(
-            obj.recipes.all()[:recipes_limit],
-            many=True
-        ).data
+        # Список подписок загружает рецепты страницы заранее
+        # (MySubscriptionsView.list).
+        if hasattr(obj, 'limited_recipes'):
+            recipes = obj.limited_recipes
+        else:
+            recipes_limit = self.context['recipes_limit']
+            if recipes_limit:
+                recipes_limit = int(recipes_limit)
+            recipes = obj.recipes.all()[:recipes_limit]
+        return RecipeSubscriptionSerializer(recipes, many=True).data
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return obj.recipes.all().count()
 
 
-class SubscriptionWriteSerializer(serializers.Serializer):
-    user = serializers.PrimaryKeyRelatedField(
-        queryset=User.objects.all()
-    )
-    subscription = serializers.PrimaryKeyRelatedField(
-        queryset=User.objects.all()
-    )
-
-    class Meta:
-        model = UserSubscription
-        fields = '__all__'
-        read_only_fields = ('id',)
-
-    def validate(self, data):
-        user = data['user']
-        subscription = data['subscription']
-        if self.context['request'].method == 'POST':
-            if user == subscription:
-                raise serializers.ValidationError(
-                    {"errors": "Вы не можете подписаться на самого себя."}
-                )
-            if UserSubscription.objects.filter(
-                user=user, subscription=subscription
-            ).exists():
-                raise serializers.ValidationError(
-                    {"errors": "Вы уже подписаны на этого пользователя."}
-                )
-        return data
-
-    def create(self, validated_data):
-        return UserSubscription.objects.create(
-            user=validated_data['user'],
-            subscription=validated_data['subscription']
-        )
-
-    def to_representation(self, data):
-        return SubscriptionReadSerializer(
-            context=self.context
-        ).to_representation(data)
-
-
 class UserCollectionReadSerializer(serializers.ModelSerializer):
 
     image = serializers.ImageField()
@@ -197,45 +181,25 @@ class UserCollectionReadSerializer(serializers.ModelSerializer):
         )
 
 
-class UserCollectionWriteSerializer(serializers.ModelSerializer):
+class BatchSerializer(serializers.Serializer):
 
-    user = serializers.PrimaryKeyRelatedField(
-        queryset=User.objects.all()
+    requests = serializers.ListField(
+        child=serializers.CharField(),
+        allow_empty=False,
+        max_length=const.BATCH_MAX_REQUESTS
     )
-    recipe = serializers.PrimaryKeyRelatedField(
-        queryset=Recipe.objects.all()
-    )
-
-    class Meta:
-        abstract = True
-        fields = '__all__'
-        read_only_fields = ('id',)
-
-    def validate(self, data):
-        user = data['user']
-        recipe = data['recipe']
-        if self.context['request'].method == 'POST':
-            if self.Meta.model.objects.filter(
-                user=user, recipe=recipe
-            ).exists():
-                raise serializers.ValidationError(
-                    {
-                        "errors": ERROR_MESSAGES[self.Meta.model]
-                    }
-                )
-        return data
 
 
-class ShoppingCartWriteSerializer(UserCollectionWriteSerializer):
+class UserCollectionBulkSerializer(serializers.Serializer):
 
-    class Meta(UserCollectionWriteSerializer.Meta):
-        model = ShoppingCart
-
-
-class FavoriteWriteSerializer(UserCollectionWriteSerializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=const.USER_COLLECTION_BULK_MAX_SIZE
+    )
 
-    class Meta(UserCollectionWriteSerializer.Meta):
-        model = Favorite
+    def validate_recipes(self, value):
+        return list(dict.fromkeys(value))
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -310,10 +274,29 @@ class RecipeIngredientReadSerializer(RecipeIngredientSerializer):
     )
 
 
+class PreloadedPrimaryKeyField(serializers.PrimaryKeyRelatedField):
+    """Первичный ключ, проверяемый по словарю объектов из контекста"""
+
+    def __init__(self, objects, **kwargs):
+        self.objects = objects
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            instance = self.context[self.objects].get(int(data))
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if instance is None:
+            self.fail('does_not_exist', pk_value=data)
+        return instance
+
+
 class RecipeIngredientWriteSerializer(RecipeIngredientSerializer):
 
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all()
+    id = PreloadedPrimaryKeyField(
+        'ingredients', queryset=Ingredient.objects.all()
     )
 
 
@@ -339,16 +322,109 @@ class RecipeSerializer(serializers.ModelSerializer):
         )
 
 
+class AuthorSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = User
+        fields = (
+            'email',
+            'id',
+            'username',
+            'first_name',
+            'last_name',
+        )
+
+
+class RecipeFragmentSerializer(serializers.ModelSerializer):
+    """Часть рецепта, одинаковая для всех пользователей"""
+
+    author = AuthorSerializer(read_only=True)
+    tags = RecipeTagSerializer(source='recipe_tags', many=True)
+    ingredients = RecipeIngredientReadSerializer(many=True)
+
+    class Meta:
+        model = Recipe
+        fields = (
+            'id',
+            'tags',
+            'author',
+            'ingredients',
+            'name',
+            'image',
+            'text',
+            'cooking_time',
+        )
+
+
+class RecipeReadListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        recipes = list(data)
+        fragments = get_fragments(recipes, RecipeFragmentSerializer)
+        return [
+            self.child.overlay(fragments[recipe.id], recipe)
+            for recipe in recipes
+        ]
+
+
 class RecipeReadSerializer(RecipeSerializer):
+    """Рецепт из кэшированного фрагмента и полей текущего пользователя"""
+
     author = UserSerializer(read_only=True)
     tags = RecipeTagSerializer(source='recipe_tags', many=True)
     ingredients = RecipeIngredientReadSerializer(many=True)
 
+    class Meta(RecipeSerializer.Meta):
+        list_serializer_class = RecipeReadListSerializer
+
+    def overlay(self, fragment, instance):
+        request = self.context.get('request')
+        representation = {}
+        for name, field in self.fields.items():
+            if name in fragment:
+                representation[name] = fragment[name]
+            else:
+                representation[name] = field.to_representation(
+                    field.get_attribute(instance)
+                )
+        representation['author'] = {
+            **fragment['author'],
+            'is_subscribed': bool(
+                request and request.user.is_authenticated
+                and instance.author_id in get_subscribed_ids(request)
+            ),
+        }
+        if request and representation['image']:
+            representation['image'] = request.build_absolute_uri(
+                representation['image']
+            )
+        return representation
+
+    def to_representation(self, instance):
+        return self.overlay(
+            get_fragments([instance], RecipeFragmentSerializer)[instance.id],
+            instance
+        )
+
+
+class PantryRecipeSerializer(RecipeReadSerializer):
+    coverage = serializers.FloatField(read_only=True)
+    missing = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipeReadSerializer.Meta):
+        fields = RecipeReadSerializer.Meta.fields + ('coverage', 'missing')
+
 
 class RecipeWriteSerializer(RecipeSerializer):
+    """Создание и изменение рецепта.
+
+    Теги и ингредиенты рецепта загружаются двумя запросами до проверки
+    полей, так что число запросов не зависит от их количества.
+    """
+
     author = serializers.PrimaryKeyRelatedField(read_only=True)
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(), many=True
+    tags = PreloadedPrimaryKeyField(
+        'tags', queryset=Tag.objects.all(), many=True
     )
     ingredients = RecipeIngredientWriteSerializer(many=True)
     name = serializers.CharField(max_length=const.NAME_MAX_LENGTH)
@@ -356,6 +432,38 @@ class RecipeWriteSerializer(RecipeSerializer):
         min_value=const.COOKING_TIME_MIN_VALUE
     )
 
+    @staticmethod
+    def preload_related(items):
+        """Теги и ингредиенты рецептов items по id для контекста"""
+
+        def as_ids(values):
+            ids = set()
+            for value in values if isinstance(values, list) else ():
+                if isinstance(value, dict):
+                    value = value.get('id')
+                try:
+                    ids.add(int(value))
+                except (TypeError, ValueError):
+                    pass
+            return ids
+
+        tag_ids, ingredient_ids = set(), set()
+        for item in items:
+            if hasattr(item, 'getlist'):
+                tag_ids |= as_ids(item.getlist('tags'))
+            else:
+                tag_ids |= as_ids(item.get('tags'))
+            ingredient_ids |= as_ids(item.get('ingredients'))
+        return {
+            'tags': Tag.objects.in_bulk(tag_ids),
+            'ingredients': Ingredient.objects.in_bulk(ingredient_ids),
+        }
+
+    def to_internal_value(self, data):
+        if 'tags' not in self.context and isinstance(data, Mapping):
+            self.context.update(self.preload_related([data]))
+        return super().to_internal_value(data)
+
     def validate_tags(self, value):
         if not value:
             raise serializers.ValidationError('Укажите теги для рецепта.')
@@ -388,10 +496,16 @@ class RecipeWriteSerializer(RecipeSerializer):
         validated_data['author'] = user
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
+        validated_data['ingredient_ids'] = sorted(
+            ingredient['id'].id for ingredient in ingredients
+        )
+        validated_data['tag_ids'] = sorted(tag.id for tag in tags)
+        validated_data['image'] = save_image_on_commit(
+            Recipe._meta.get_field('image'), validated_data['image']
+        )
 
         if recipe:
-            if os.path.exists(recipe.image.path):
-                os.remove(recipe.image.path)
+            delete_image_on_commit(recipe.image)
             new_image = validated_data.pop('image')
             Recipe.objects.filter(id=recipe.id).update(**validated_data)
             recipe = Recipe.objects.get(id=recipe.id)
@@ -417,9 +531,11 @@ class RecipeWriteSerializer(RecipeSerializer):
         return recipe
 
     def create(self, validated_data):
-        return self.create_or_update(
+        recipe = self.create_or_update(
             self.context.get('request').user, validated_data
         )
+        fan_out_recipe(recipe)
+        return recipe
 
     def update(self, instance, validated_data):
         return self.create_or_update(
@@ -435,6 +551,55 @@ class RecipeWriteSerializer(RecipeSerializer):
         ).data
 
 
+class RecipeBulkItemSerializer(RecipeWriteSerializer):
+    """Рецепт из пакета, теги и ингредиенты которого загружены заранее"""
+
+    @staticmethod
+    def bulk_create(user, items):
+        image_field = Recipe._meta.get_field('image')
+        with transaction.atomic():
+            recipes = Recipe.objects.bulk_create([
+                Recipe(
+                    author=user,
+                    name=item['name'],
+                    text=item['text'],
+                    cooking_time=item['cooking_time'],
+                    image=save_image_on_commit(image_field, item['image']),
+                    ingredient_ids=sorted(
+                        ingredient['id'].id
+                        for ingredient in item['ingredients']
+                    ),
+                    tag_ids=sorted(tag.id for tag in item['tags']),
+                )
+                for item in items
+            ])
+            RecipeIngredient.objects.bulk_create([
+                RecipeIngredient(
+                    recipe=recipe,
+                    ingredient=ingredient['id'],
+                    amount=ingredient['amount']
+                )
+                for recipe, item in zip(recipes, items)
+                for ingredient in item['ingredients']
+            ])
+            RecipeTag.objects.bulk_create([
+                RecipeTag(recipe=recipe, tag=tag)
+                for recipe, item in zip(recipes, items)
+                for tag in item['tags']
+            ])
+        fan_out_recipes(user.id, recipes)
+        return recipes
+
+
+class RecipeBulkSerializer(serializers.Serializer):
+
+    recipes = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=const.RECIPE_BULK_MAX_SIZE
+    )
+
+
 class RecipeSubscriptionSerializer(serializers.ModelSerializer):
 
     class Meta:
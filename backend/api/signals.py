@@ -0,0 +1,21 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.models import Ingredient, Tag
+
+from .catalogue import ingredient_snapshot, tag_snapshot
+
+# Снимок и версия каталога (часть ключей кэша фрагментов) обновляются
+# после фиксации транзакции: иначе снимок, собранный параллельным
+# запросом до фиксации, закэшировался бы под новой версией.
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tag_snapshot(**kwargs):
+    transaction.on_commit(tag_snapshot.invalidate)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_snapshot(**kwargs):
+    transaction.on_commit(ingredient_snapshot.invalidate)
@@ -0,0 +1,73 @@
+from django.conf import settings
+
+from rest_framework.throttling import BaseThrottle
+
+from backend.ratelimit import get_buckets
+
+DURATIONS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'10/min' -> (10, 60)"""
+    number, period = rate.split('/')
+    return int(number), DURATIONS[period[0]]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Ограничение частоты запросов по алгоритму корзины токенов.
+
+    Область задается атрибутом представления throttle_scope или словарем
+    throttle_scopes по действиям, скорость и емкость корзины - строкой
+    вида '10/min' в DEFAULT_THROTTLE_RATES. Представление может задать
+    стоимость запроса методом get_throttle_cost.
+    """
+
+    rate_suffix = ''
+
+    def get_scope(self, view):
+        scopes = getattr(view, 'throttle_scopes', {})
+        return scopes.get(getattr(view, 'action', None)) or getattr(
+            view, 'throttle_scope', None
+        )
+
+    def get_key(self, request):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        self.wait_time = None
+        scope = self.get_scope(view)
+        rate = settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'].get(
+            f'{scope}{self.rate_suffix}'
+        )
+        if not scope or not rate or not settings.THROTTLE_ENABLED:
+            return True
+        capacity, duration = parse_rate(rate)
+        cost = 1
+        if hasattr(view, 'get_throttle_cost'):
+            cost = min(view.get_throttle_cost(), capacity)
+        self.wait_time = get_buckets().consume(
+            f'{scope}{self.rate_suffix}:{self.get_key(request)}',
+            capacity, capacity / duration, cost
+        )
+        return not self.wait_time
+
+    def wait(self):
+        return self.wait_time
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    """Корзина пользователя (для анонимных - IP-адреса)"""
+
+    def get_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return f'ip:{self.get_ident(request)}'
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    """Корзина IP-адреса, общая для всех пользователей с него"""
+
+    rate_suffix = '_ip'
+
+    def get_key(self, request):
+        return self.get_ident(request)
@@ -3,13 +3,16 @@ from django.urls import include, path, re_path
 from rest_framework.routers import DefaultRouter
 
 from .views import (
+    BatchView,
+    ChangesView,
     FavoriteCreateDeleteViewSet,
     IngredientViewSet,
     MySubscriptionsView,
     RecipeViewSet,
     ShoppingCartCreateDeleteViewSet,
     SubscriptionCreateDeleteView,
-    TagViewSet
+    TagViewSet,
+    UserExportView
 )
 
 router = DefaultRouter()
@@ -18,9 +21,12 @@ router.register('ingredients', IngredientViewSet, basename='ingredients')
 router.register('recipes', RecipeViewSet, basename='recipes')
 
 urlpatterns = [
+    path('batch/', BatchView.as_view()),
+    path('changes/', ChangesView.as_view()),
     path(
         'users/subscriptions/', MySubscriptionsView.as_view({'get': 'list'})
     ),
+    path('users/me/export/', UserExportView.as_view()),
     re_path(
         r'^users/(?P<id>\d+)/subscribe/',
         SubscriptionCreateDeleteView.as_view()
@@ -31,6 +37,26 @@ urlpatterns = [
             {'get': 'shopping_cart_download'}
         )
     ),
+    path(
+        'recipes/shopping_cart/',
+        ShoppingCartCreateDeleteViewSet.as_view(
+            {'post': 'bulk_add', 'delete': 'clear'}
+        )
+    ),
+    path(
+        'recipes/shopping_cart/remove/',
+        ShoppingCartCreateDeleteViewSet.as_view({'post': 'bulk_remove'})
+    ),
+    path(
+        'recipes/favorite/',
+        FavoriteCreateDeleteViewSet.as_view(
+            {'post': 'bulk_add', 'delete': 'clear'}
+        )
+    ),
+    path(
+        'recipes/favorite/remove/',
+        FavoriteCreateDeleteViewSet.as_view({'post': 'bulk_remove'})
+    ),
     re_path(
         r'^recipes/(?P<id>\d+)/shopping_cart/',
         ShoppingCartCreateDeleteViewSet.as_view(
@@ -1,3 +1,42 @@
+import io
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.postgres.fields import ArrayField
+from django.db.models import IntegerField, Subquery
+from django.template.response import SimpleTemplateResponse
+
+import backend.constants as const
+from backend import metrics
+from users.models import UserSubscription
+
+PDF_FONT = 'DejaVuSans'
+
+
+def get_request_cache(request):
+    """Кэш на время запроса, общий для подзапросов пакетного запроса"""
+    request = getattr(request, '_request', request)
+    if not hasattr(request, 'request_cache'):
+        request.request_cache = {}
+    return request.request_cache
+
+
+def get_subscribed_ids(request):
+    """id авторов, на которых подписан текущий пользователь"""
+    cache = get_request_cache(request)
+    if 'subscribed_ids' not in cache:
+        cache['subscribed_ids'] = set(UserSubscription.objects.filter(
+            user=request.user
+        ).values_list('subscription_id', flat=True))
+    return cache['subscribed_ids']
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
 def generate_shopping_cart(sc_ingredients):
     text = 'Список покупок:\n\n'
     for ingredient in sc_ingredients:
@@ -7,3 +46,57 @@ def generate_shopping_cart(sc_ingredients):
             f'{ingredient["amount"]}\n'
         )
     return text
+
+
+def render_shopping_cart_pdf(file, text):
+    """Записывает список покупок в PDF.
+
+    reportlab загружается при первом вызове: он нужен только для
+    выгрузки списка покупок и заметно замедляет запуск процессов.
+    """
+    from reportlab.lib.units import cm
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfgen import canvas
+
+    if PDF_FONT not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(
+            TTFont(PDF_FONT, settings.BASE_DIR / 'data/DejaVuSans.ttf')
+        )
+    p = canvas.Canvas(file)
+    p.setFont(PDF_FONT, const.PDF_FONT_SIZE)
+    textobject = p.beginText(2 * cm, 29.7 * cm - 2 * cm)
+    for line in text.splitlines(False):
+        textobject.textLine(line.rstrip())
+    p.drawText(textobject)
+    p.save()
+
+
+class ShoppingCartPDFResponse(SimpleTemplateResponse):
+    """PDF со списком покупок, который формируется при рендеринге ответа.
+
+    Как и ответы DRF, ответ рендерится обработчиком Django после выхода
+    из view, то есть вне транзакции QueryLimitMixin: текст списка
+    получается из базы заранее.
+    """
+
+    def __init__(self, text):
+        super().__init__(None, content_type='application/pdf')
+        self.text = text
+        self[
+            'Content-Disposition'
+        ] = 'attachment; filename="shopping-cart.pdf"'
+
+    @property
+    def rendered_content(self):
+        buffer = io.BytesIO()
+        with metrics.timer('shopping_cart_pdf_render_seconds'):
+            render_shopping_cart_pdf(buffer, self.text)
+        return buffer.getvalue()
+
+
+class ArraySubquery(Subquery):
+    """Значения подзапроса одним массивом id"""
+
+    template = 'ARRAY(%(subquery)s)'
+    output_field = ArrayField(IntegerField())
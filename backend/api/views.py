@@ -1,62 +1,106 @@
-from django.db.models import F, Sum
-from django.http import HttpResponse
+import copy
+import json
+import re
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.db.models import (
+    Count,
+    F,
+    OuterRef,
+    Q,
+    Sum,
+    prefetch_related_objects
+)
+from django.http import Http404, QueryDict, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.urls import resolve
+from django.utils import timezone
 
 from django_filters.rest_framework import DjangoFilterBackend
-from reportlab.lib.units import cm
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfgen import canvas
 from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 from rest_framework.views import APIView
 
 import backend.constants as const
-from backend.settings import BASE_DIR
+from recipes.feed import backfill_subscription, remove_subscription
 from recipes.models import (
+    ChangeLogEntry,
     Favorite,
     Ingredient,
     Recipe,
     RecipeIngredient,
+    RecipeNeighbour,
     ShoppingCart,
     Tag
 )
+from recipes.pantry import PantryIndexNotReady, pantry_index
 from users.models import User, UserSubscription
 
-from .filters import IngredientFilter, RecipeFilter
-from .mixins import PatchModelMixin
+from .catalogue import ingredient_snapshot, tag_snapshot
+from .filters import FACETS, IngredientFilter, RecipeFilter, get_facets
+from .mixins import CatalogueSnapshotMixin, PatchModelMixin, QueryLimitMixin
+from .pagination import FeedPagination
 from .permissions import IsAuthorOrReadOnly
 from .serializers import (
     ERROR_MESSAGES,
-    FavoriteWriteSerializer,
+    MISSING_ERROR_MESSAGES,
+    RECIPE_NOT_FOUND_ERROR,
+    AuthorSerializer,
+    BatchSerializer,
     IngredientSerializer,
+    PantryRecipeSerializer,
+    RecipeBulkItemSerializer,
+    RecipeBulkSerializer,
+    RecipeFragmentSerializer,
+    RecipeReadSerializer,
+    RecipeSubscriptionSerializer,
     RecipeWriteSerializer,
-    ShoppingCartWriteSerializer,
     SubscriptionReadSerializer,
-    SubscriptionWriteSerializer,
     TagSerializer,
+    UserCollectionBulkSerializer,
     UserCollectionReadSerializer
 )
-from .utils import generate_shopping_cart
+from .utils import (
+    ArraySubquery,
+    ShoppingCartPDFResponse,
+    chunked,
+    generate_shopping_cart,
+    get_request_cache
+)
+
+CURSOR = re.compile(r'^(\d+)\.(\d+)\.(\d+)$')
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(
+    QueryLimitMixin,
+    CatalogueSnapshotMixin,
+    viewsets.ReadOnlyModelViewSet
+):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
+    snapshot = tag_snapshot
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(
+    QueryLimitMixin,
+    CatalogueSnapshotMixin,
+    viewsets.ReadOnlyModelViewSet
+):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
+    snapshot = ingredient_snapshot
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
 
 
 class RecipeViewSet(
+    QueryLimitMixin,
     mixins.CreateModelMixin,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
@@ -64,32 +108,219 @@ class RecipeViewSet(
     mixins.DestroyModelMixin,
     viewsets.GenericViewSet,
 ):
-    serializer_class = RecipeWriteSerializer
     permission_classes = (IsAuthorOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    throttle_scopes = {
+        'create': 'recipe_create',
+        'bulk_create': 'recipe_bulk_create',
+        'list': 'recipe_list',
+    }
+    statement_timeouts = {
+        'list': const.STATEMENT_TIMEOUT_SEARCH,
+        'feed': const.STATEMENT_TIMEOUT_SEARCH,
+        'pantry': const.STATEMENT_TIMEOUT_SEARCH,
+        'retrieve': const.STATEMENT_TIMEOUT_READ,
+        'similar': const.STATEMENT_TIMEOUT_READ,
+        'bulk_create': const.STATEMENT_TIMEOUT_BULK,
+    }
+    query_budgets = {
+        'list': const.QUERY_BUDGET_LIST,
+        'feed': const.QUERY_BUDGET_LIST,
+        'pantry': const.QUERY_BUDGET_LIST,
+        'retrieve': const.QUERY_BUDGET_READ,
+        'similar': const.QUERY_BUDGET_READ,
+        'create': const.QUERY_BUDGET_WRITE,
+        'partial_update': const.QUERY_BUDGET_WRITE,
+        'bulk_create': const.QUERY_BUDGET_WRITE,
+    }
 
     def get_queryset(self):
         return Recipe.objects.favorite_and_shopping_cart(
             self.request.user.id
-        ).select_related(
-            'author'
-        ).prefetch_related(
-            'tags'
-        ).prefetch_related(
-            'ingredients'
+        ).select_related('author')
+
+    def get_serializer_class(self):
+        if self.action in ('list', 'retrieve'):
+            return RecipeReadSerializer
+        return RecipeWriteSerializer
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        facets = set(request.query_params.get('facets', '').split(','))
+        if facets & set(FACETS):
+            filterset = self.filterset_class(
+                request.query_params,
+                queryset=self.get_queryset(),
+                request=request
+            )
+            filterset.is_valid()
+            queryset = filterset.queryset
+            for name, value in filterset.form.cleaned_data.items():
+                if name != 'tags':
+                    queryset = filterset.filters[name].filter(queryset, value)
+            response.data['facets'] = get_facets(
+                queryset,
+                [tag.id for tag in filterset.form.cleaned_data['tags']],
+                facets
+            )
+        return response
+
+    def get_throttle_cost(self):
+        """Большая страница списка расходует несколько токенов"""
+        if self.action != 'list':
+            return 1
+        page_size = self.paginator.get_page_size(self.request)
+        return max(1, -(-page_size // self.paginator.page_size))
+
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=(IsAuthenticated,),
+        pagination_class=FeedPagination,
+    )
+    def feed(self, request):
+        page = self.paginate_queryset(self.get_queryset())
+        serializer = RecipeReadSerializer(
+            page, many=True, context=self.get_serializer_context()
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='bulk',
+        permission_classes=(IsAuthenticated,),
+    )
+    def bulk_create(self, request):
+        serializer = RecipeBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data['recipes']
+        context = {
+            'request': request,
+            **RecipeBulkItemSerializer.preload_related(items),
+        }
+        results = []
+        valid = []
+        for index, item in enumerate(items):
+            item_serializer = RecipeBulkItemSerializer(
+                data=item, context=context
+            )
+            if item_serializer.is_valid():
+                valid.append(item_serializer.validated_data)
+                results.append({
+                    'index': index, 'status': status.HTTP_201_CREATED
+                })
+            else:
+                results.append({
+                    'index': index,
+                    'status': status.HTTP_400_BAD_REQUEST,
+                    'errors': item_serializer.errors,
+                })
+        recipes = iter(
+            RecipeBulkItemSerializer.bulk_create(request.user, valid)
+        )
+        for result in results:
+            if result['status'] == status.HTTP_201_CREATED:
+                result['id'] = next(recipes).id
+        return Response({'results': results})
+
+    def perform_destroy(self, instance):
+        pantry_index.remove(instance.id)
+        instance.delete()
+
+    @action(detail=False, methods=['get'])
+    def pantry(self, request):
+        try:
+            ingredient_ids = [
+                int(ingredient_id) for ingredient_id
+                in request.query_params.getlist('ingredients')
+            ]
+        except ValueError:
+            ingredient_ids = None
+        if (
+            not ingredient_ids
+            or len(ingredient_ids) > const.PANTRY_MAX_INGREDIENTS
+        ):
+            return Response(
+                {"errors": "Укажите от 1 до "
+                 f"{const.PANTRY_MAX_INGREDIENTS} ингредиентов."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            matches = self.paginate_queryset(
+                pantry_index.match(ingredient_ids)
+            )
+        except PantryIndexNotReady:
+            return Response(
+                {"errors": "Поиск по ингредиентам еще не готов, "
+                 "повторите позже."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _, _ in matches]
+        )
+        results = []
+        for recipe_id, coverage, missing in matches:
+            if not (recipe := recipes.get(recipe_id)):
+                pantry_index.remove(recipe_id)
+                continue
+            recipe.coverage, recipe.missing = coverage, missing
+            results.append(recipe)
+        serializer = PantryRecipeSerializer(
+            results, many=True, context=self.get_serializer_context()
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk):
+        neighbours = [
+            record.neighbour for record in RecipeNeighbour.objects.filter(
+                recipe_id=pk
+            ).select_related('neighbour')
+        ]
+        if not neighbours:
+            get_object_or_404(Recipe, pk=pk)
+        return Response(
+            RecipeSubscriptionSerializer(
+                neighbours, many=True, context={'request': request}
+            ).data
         )
 
 
 class MySubscriptionsView(
+    QueryLimitMixin,
     viewsets.GenericViewSet,
     mixins.ListModelMixin
 ):
     permission_classes = (IsAuthenticated,)
     serializer_class = SubscriptionReadSerializer
+    query_budgets = {'list': const.QUERY_BUDGET_LIST}
 
     def get_queryset(self):
-        return self.request.user.subscriptions.all()
+        recipes_limit = self.request.GET.get('recipes_limit')
+        recipes = Recipe.objects.filter(
+            author=OuterRef('pk')
+        ).values('id')[:int(recipes_limit) if recipes_limit else None]
+        return self.request.user.subscriptions.annotate(
+            recipes_count=Count('recipes'),
+            recipe_ids=ArraySubquery(recipes)
+        ).order_by('id')
+
+    def list(self, request, *args, **kwargs):
+        """Рецепты всех авторов страницы загружаются одним запросом"""
+        page = self.paginate_queryset(self.get_queryset())
+        recipes = Recipe.objects.only(
+            'id', 'name', 'image', 'cooking_time'
+        ).in_bulk([
+            recipe_id for author in page for recipe_id in author.recipe_ids
+        ])
+        for author in page:
+            author.limited_recipes = [
+                recipes[recipe_id] for recipe_id in author.recipe_ids
+            ]
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -97,22 +328,30 @@ class MySubscriptionsView(
         return context
 
 
-class SubscriptionCreateDeleteView(APIView):
+class SubscriptionCreateDeleteView(QueryLimitMixin, APIView):
 
     permission_classes = (IsAuthenticated,)
+    statement_timeouts = {
+        'post': const.STATEMENT_TIMEOUT_BULK,
+        'delete': const.STATEMENT_TIMEOUT_BULK,
+    }
 
     def post(self, request, id):
         recipes_limit = request.query_params.get('recipes_limit')
         subscribed_user = get_object_or_404(User, pk=id)
-        serializer = SubscriptionWriteSerializer(
-            context={'request': request, 'recipes_limit': recipes_limit},
-            data={
-                'user': self.request.user.id,
-                'subscription': subscribed_user.id,
-            }
-        )
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
+        if subscribed_user == request.user:
+            return Response(
+                {"errors": "Вы не можете подписаться на самого себя."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not UserSubscription.objects.subscribe(
+            request.user.id, subscribed_user.id
+        ):
+            return Response(
+                {"errors": "Вы уже подписаны на этого пользователя."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        backfill_subscription(request.user, subscribed_user)
         return Response(
             SubscriptionReadSerializer(
                 subscribed_user,
@@ -122,21 +361,20 @@ class SubscriptionCreateDeleteView(APIView):
         )
 
     def delete(self, request, id):
-        current_user = self.request.user
         subscribed_user = get_object_or_404(User, pk=id)
-        subscription = UserSubscription.objects.filter(
-            user=current_user, subscription=subscribed_user
-        )
-        if not subscription:
+        if not UserSubscription.objects.unsubscribe(
+            request.user.id, subscribed_user.id
+        ):
             return Response(
                 {"errors": "Вы не подписаны на этого пользователя."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        subscription.delete()
+        remove_subscription(request.user, subscribed_user)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class UserCollectionCreateDeleteViewSet(
+    QueryLimitMixin,
     viewsets.GenericViewSet,
     mixins.CreateModelMixin,
     mixins.DestroyModelMixin
@@ -145,36 +383,80 @@ class UserCollectionCreateDeleteViewSet(
     permission_classes = (IsAuthenticated,)
 
     def post(self, request, id):
-        if not (recipe := Recipe.objects.filter(pk=id).first()):
+        recipe_id = int(id)
+        added = self._model.objects.add(request.user.id, [recipe_id])
+        if recipe_id not in added:
             return Response(
-                {"errors": "Некорректный номер рецепта."},
+                {"errors": RECIPE_NOT_FOUND_ERROR},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        recipe, created = added[recipe_id]
+        if not created:
+            return Response(
+                {"errors": ERROR_MESSAGES[self._model]},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        serializer = self._serializer(
-            context={'request': request},
-            data={
-                'user': self.request.user.id,
-                'recipe': recipe.id,
-            }
-        )
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
         return Response(
             UserCollectionReadSerializer(recipe).data,
             status=status.HTTP_201_CREATED
         )
 
     def delete(self, request, id):
-        user = self.request.user
-        recipe = get_object_or_404(Recipe, pk=id)
-        if not (record := self._model.objects.filter(
-            user=user, recipe=recipe
-        )):
+        if not self._model.objects.remove(request.user.id, [int(id)]):
+            get_object_or_404(Recipe, pk=id)
             return Response(
-                {"errors": ERROR_MESSAGES[self._model]},
+                {"errors": MISSING_ERROR_MESSAGES[self._model]},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        record.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    def get_bulk_recipe_ids(self, request):
+        serializer = UserCollectionBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data['recipes']
+
+    def bulk_add(self, request):
+        recipe_ids = self.get_bulk_recipe_ids(request)
+        added = self._model.objects.add(request.user.id, recipe_ids)
+        results = []
+        for recipe_id in recipe_ids:
+            if recipe_id not in added:
+                results.append({
+                    'id': recipe_id,
+                    'status': status.HTTP_400_BAD_REQUEST,
+                    'errors': RECIPE_NOT_FOUND_ERROR,
+                })
+            elif not added[recipe_id][1]:
+                results.append({
+                    'id': recipe_id,
+                    'status': status.HTTP_400_BAD_REQUEST,
+                    'errors': ERROR_MESSAGES[self._model],
+                })
+            else:
+                results.append({
+                    'id': recipe_id,
+                    'status': status.HTTP_201_CREATED,
+                    'recipe': UserCollectionReadSerializer(
+                        added[recipe_id][0]
+                    ).data,
+                })
+        return Response({'results': results})
+
+    def bulk_remove(self, request):
+        recipe_ids = self.get_bulk_recipe_ids(request)
+        removed = self._model.objects.remove(request.user.id, recipe_ids)
+        return Response({'results': [
+            {'id': recipe_id, 'status': status.HTTP_204_NO_CONTENT}
+            if recipe_id in removed else {
+                'id': recipe_id,
+                'status': status.HTTP_400_BAD_REQUEST,
+                'errors': MISSING_ERROR_MESSAGES[self._model],
+            }
+            for recipe_id in recipe_ids
+        ]})
+
+    def clear(self, request):
+        self._model.objects.filter(user=request.user).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -184,7 +466,11 @@ class ShoppingCartCreateDeleteViewSet(
 ):
 
     _model = ShoppingCart
-    _serializer = ShoppingCartWriteSerializer
+    throttle_scopes = {'shopping_cart_download': 'shopping_cart_download'}
+    statement_timeouts = {
+        'shopping_cart_download': const.STATEMENT_TIMEOUT_REPORT
+    }
+    query_budgets = {'shopping_cart_download': const.QUERY_BUDGET_READ}
 
     @action(detail=False, method=['get'])
     def shopping_cart_download(self, request):
@@ -194,23 +480,229 @@ class ShoppingCartCreateDeleteViewSet(
             name=F('ingredient__name'),
             measurement_unit=F('ingredient__measurement_unit')
         ).annotate(amount=Sum('amount'))
-        response = HttpResponse(content_type='application/pdf')
+        return ShoppingCartPDFResponse(generate_shopping_cart(sc_ingredients))
+
+
+class FavoriteCreateDeleteViewSet(UserCollectionCreateDeleteViewSet):
+
+    _model = Favorite
+
+
+class BatchView(APIView):
+    """Выполняет несколько GET-запросов к API за один запрос"""
+
+    throttle_scope = 'batch'
+
+    def get_subrequest(self, request, url):
+        parts = urlsplit(url)
+        path = parts.path
+        if not path.startswith('/'):
+            path = '/api/' + path
+        subrequest = copy.copy(request._request)
+        subrequest.method = 'GET'
+        subrequest.path = subrequest.path_info = path
+        subrequest.GET = QueryDict(parts.query)
+        subrequest.META = {
+            key: value for key, value in request._request.META.items()
+            if key not in ('HTTP_ACCEPT_ENCODING', 'HTTP_IF_NONE_MATCH')
+        }
+        subrequest.META.update({
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': path,
+            'QUERY_STRING': parts.query,
+        })
+        subrequest._force_auth_user = request.user
+        subrequest._force_auth_token = request.auth
+        return subrequest
+
+    def get_response(self, request, url):
+        subrequest = self.get_subrequest(request, url)
+        try:
+            if not subrequest.path.startswith('/api/'):
+                raise Http404
+            match = resolve(subrequest.path)
+        except Http404:
+            match = None
+        if not match or getattr(match.func, 'view_class', None) is BatchView:
+            return status.HTTP_404_NOT_FOUND, {"errors": "Адрес не найден."}
+        subrequest.resolver_match = match
+        response = match.func(subrequest, *match.args, **match.kwargs)
+        if hasattr(response, 'data'):
+            return response.status_code, response.data
+        if response.get('Content-Type') == 'application/json':
+            # Готовый снимок каталога, см. CatalogueSnapshotMixin
+            return response.status_code, json.loads(response.content)
+        return status.HTTP_406_NOT_ACCEPTABLE, {
+            "errors": "Ответ не поддерживается в пакетном запросе."
+        }
+
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        get_request_cache(request)
+        results = []
+        for url in serializer.validated_data['requests']:
+            status_code, data = self.get_response(request, url)
+            results.append({
+                'path': url,
+                'status': status_code,
+                'data': data,
+            })
+        return Response(results)
+
+
+class UserExportView(APIView):
+    """Выгрузка всех данных пользователя в формате NDJSON.
+
+    Записи читаются курсором на стороне сервера и сериализуются пачками,
+    поэтому память не зависит от объема данных.
+    """
+
+    permission_classes = (IsAuthenticated,)
+    throttle_scope = 'user_export'
+
+    def get(self, request):
+        response = StreamingHttpResponse(
+            self.lines(request), content_type='application/x-ndjson'
+        )
         response[
             'Content-Disposition'
-        ] = 'attachment; filename="shopping-cart.pdf"'
-        p = canvas.Canvas(response)
-        font_dir = BASE_DIR / 'data/DejaVuSans.ttf'
-        pdfmetrics.registerFont(TTFont('DejaVuSans', font_dir))
-        p.setFont('DejaVuSans', const.PDF_FONT_SIZE)
-        textobject = p.beginText(2 * cm, 29.7 * cm - 2 * cm)
-        for line in generate_shopping_cart(sc_ingredients).splitlines(False):
-            textobject.textLine(line.rstrip())
-        p.drawText(textobject)
-        p.save()
+        ] = 'attachment; filename="foodgram-export.ndjson"'
         return response
 
+    @staticmethod
+    def line(record_type, data):
+        return json.dumps(
+            {'type': record_type, 'data': data},
+            cls=JSONEncoder, ensure_ascii=False
+        ) + '\n'
 
-class FavoriteCreateDeleteViewSet(UserCollectionCreateDeleteViewSet):
+    @staticmethod
+    def chunks(queryset):
+        return chunked(
+            queryset.iterator(chunk_size=const.EXPORT_CHUNK_SIZE),
+            const.EXPORT_CHUNK_SIZE
+        )
 
-    _model = Favorite
-    _serializer = FavoriteWriteSerializer
+    def lines(self, request):
+        user = request.user
+        context = {'request': request}
+        yield self.line('user', AuthorSerializer(user).data)
+
+        for chunk in self.chunks(Recipe.objects.filter(
+            author=user
+        ).select_related('author').order_by('id')):
+            prefetch_related_objects(
+                chunk, 'recipe_tags__tag', 'ingredients__ingredient'
+            )
+            yield ''.join(
+                self.line('recipe', data) for data in RecipeFragmentSerializer(
+                    chunk, many=True, context=context
+                ).data
+            )
+
+        for record_type, model in (
+            ('favorite', Favorite), ('shopping_cart', ShoppingCart)
+        ):
+            for chunk in self.chunks(model.objects.filter(
+                user=user
+            ).select_related('recipe').order_by('id')):
+                yield ''.join(
+                    self.line(record_type, {
+                        **UserCollectionReadSerializer(
+                            record.recipe, context=context
+                        ).data,
+                        'added': record.created,
+                    })
+                    for record in chunk
+                )
+
+        for chunk in self.chunks(UserSubscription.objects.filter(
+            user=user
+        ).select_related('subscription').order_by('id')):
+            yield ''.join(
+                self.line(
+                    'subscription', AuthorSerializer(record.subscription).data
+                )
+                for record in chunk
+            )
+
+
+class ChangesView(QueryLimitMixin, APIView):
+    """Изменения рецептов и коллекций пользователя после курсора.
+
+    Курсор без параметра since указывает на текущий конец журнала: клиент
+    получает его до полной загрузки данных, а затем запрашивает только
+    изменения. Курсор старше CHANGES_RETENTION_DAYS мог пропустить
+    удаления, удаленные из журнала, поэтому отвергается с кодом 410.
+    """
+
+    permission_classes = (IsAuthenticated,)
+
+    @staticmethod
+    def make_cursor(xid, id, now):
+        return f'{xid}.{id}.{int(now.timestamp())}'
+
+    @staticmethod
+    def collapse(entries):
+        """Последнее действие с каждым объектом в порядке журнала"""
+        changes = {}
+        for entry in entries:
+            key = (entry.kind, entry.object_id)
+            previous = changes.pop(key, None)
+            action = entry.action
+            if (
+                previous and previous['action'] == ChangeLogEntry.INSERT
+                and action == ChangeLogEntry.UPDATE
+            ):
+                action = ChangeLogEntry.INSERT
+            changes[key] = {
+                'type': entry.kind, 'id': entry.object_id, 'action': action
+            }
+        return list(changes.values())
+
+    def get(self, request):
+        now = timezone.now()
+        entries = ChangeLogEntry.objects.visible().relevant_to(
+            request.user.id
+        ).only('id', 'xid', 'kind', 'object_id', 'action')
+        since = request.query_params.get('since')
+        if since is None:
+            last = entries.order_by('-xid', '-id').values_list(
+                'xid', 'id'
+            ).first() or (0, 0)
+            return Response({
+                'cursor': self.make_cursor(*last, now),
+                'has_more': False,
+                'results': [],
+            })
+
+        match = CURSOR.match(since)
+        if not match:
+            return Response(
+                {"errors": "Некорректный курсор."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        xid, id, issued = map(int, match.groups())
+        if issued < (now - timedelta(
+            days=const.CHANGES_RETENTION_DAYS
+        )).timestamp():
+            return Response(
+                {"errors": "Курсор устарел, загрузите данные заново."},
+                status=status.HTTP_410_GONE
+            )
+        page = list(entries.filter(
+            Q(xid__gt=xid) | Q(xid=xid, id__gt=id)
+        )[:const.CHANGES_PAGE_SIZE + 1])
+        has_more = len(page) > const.CHANGES_PAGE_SIZE
+        page = page[:const.CHANGES_PAGE_SIZE]
+        if page:
+            xid, id = page[-1].xid, page[-1].id
+        # Пустая страница: клиент получил все изменения на текущий момент,
+        # курсор выдается заново, чтобы не устареть при редких изменениях.
+        cursor = self.make_cursor(xid, id, now)
+        return Response({
+            'cursor': cursor,
+            'has_more': has_more,
+            'results': self.collapse(page),
+        })
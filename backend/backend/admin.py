@@ -0,0 +1,10 @@
+from django.contrib import admin
+
+from .paginator import EstimatedCountPaginator
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Настройки списков для таблиц с миллионами строк"""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
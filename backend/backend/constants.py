@@ -7,3 +7,55 @@ USER_NAME_MAX_LENGTH = 150
 USER_EMAIL_MAX_LENGTH = 254
 
 PDF_FONT_SIZE = 14
+
+FEED_MAX_LENGTH = 1000
+FEED_FANOUT_MAX_SUBSCRIBERS = 5000
+FEED_PAGE_SIZE = 6
+
+SIMILAR_RECIPES_COUNT = 10
+SIMILARITY_TAG_WEIGHT = 0.2
+SIMILARITY_BATCH_SIZE = 500
+SIMILARITY_MAX_POSTINGS = 50000
+
+PANTRY_MAX_INGREDIENTS = 50
+PANTRY_INDEX_REFRESH_INTERVAL = 10
+PANTRY_INDEX_REFRESH_LAG = 5
+PANTRY_INDEX_WARMUP_TIMEOUT = 2
+PANTRY_INDEX_REBUILD_INTERVAL = 3600
+
+TRENDING_HALF_LIFE_DAYS = 3
+TRENDING_WINDOW_DAYS = 14
+TRENDING_SHOPPING_CART_WEIGHT = 0.5
+
+USER_COLLECTION_BULK_MAX_SIZE = 100
+
+BATCH_MAX_REQUESTS = 20
+
+ADMIN_ESTIMATED_COUNT_THRESHOLD = 10000
+
+THROTTLE_TABLE_SIZE = 1 << 16
+THROTTLE_MAX_PROBES = 16
+
+RECIPE_FRAGMENT_CACHE_TIMEOUT = 24 * 60 * 60
+
+PAGE_MAX_SIZE = 100
+EXPORT_CHUNK_SIZE = 200
+
+COOKING_TIME_FACET_BOUNDS = (15, 30, 60)
+
+RECIPE_BULK_MAX_SIZE = 200
+
+LAZY_IMPORT_MODULES = ('reportlab', 'PIL')
+
+CHANGE_KIND_MAX_LENGTH = 16
+CHANGE_ACTION_MAX_LENGTH = 8
+CHANGES_PAGE_SIZE = 500
+CHANGES_RETENTION_DAYS = 30
+
+STATEMENT_TIMEOUT_READ = 1000
+STATEMENT_TIMEOUT_SEARCH = 3000
+STATEMENT_TIMEOUT_REPORT = 10000
+STATEMENT_TIMEOUT_BULK = 30000
+QUERY_BUDGET_READ = 15
+QUERY_BUDGET_LIST = 20
+QUERY_BUDGET_WRITE = 40
@@ -0,0 +1,215 @@
+"""Метрики в формате Prometheus, общие для всех процессов gunicorn.
+
+Каждый процесс пишет значения в собственный файл в METRICS_DIR,
+отображенный в память. Файл состоит из заголовка с размером занятой
+части и записей вида: длина ключа, ключ (строка сэмпла Prometheus),
+выравнивание до 8 байт, значение double. При выдаче /metrics значения
+с одинаковым ключом суммируются по всем файлам.
+
+Мастер gunicorn очищает каталог при запуске (clear) и переносит
+значения завершившихся процессов в общий файл (mark_process_dead),
+поэтому число файлов не растет с перезапусками процессов.
+"""
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+
+HEADER = struct.Struct('q')
+KEY_LENGTH = struct.Struct('i')
+VALUE = struct.Struct('d')
+INITIAL_SIZE = 1 << 16
+ARCHIVE = 'archive.db'
+
+METRICS = {
+    'http_requests_total': (
+        'counter', 'Количество запросов по представлениям и статусам'
+    ),
+    'http_request_duration_seconds': (
+        'histogram', 'Время обработки запроса'
+    ),
+    'db_queries_total': (
+        'counter', 'Количество SQL-запросов'
+    ),
+    'db_limit_exceeded_total': (
+        'counter', 'Запросы, прерванные по лимиту времени или числа SQL'
+    ),
+    'shopping_cart_pdf_render_seconds': (
+        'histogram', 'Время формирования PDF со списком покупок'
+    ),
+}
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def read_records(data, used):
+    offset = HEADER.size
+    while offset < used:
+        (length,) = KEY_LENGTH.unpack_from(data, offset)
+        key_start = offset + KEY_LENGTH.size
+        key = bytes(data[key_start:key_start + length]).decode()
+        value_offset = (key_start + length + 7) & ~7
+        (value,) = VALUE.unpack_from(data, value_offset)
+        yield key, value, value_offset
+        offset = value_offset + VALUE.size
+
+
+class MmapValues:
+    """Значения метрик одного процесса"""
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.file = open(path, 'a+b')
+        size = os.fstat(self.file.fileno()).st_size
+        if size < INITIAL_SIZE:
+            self.file.truncate(INITIAL_SIZE)
+            size = INITIAL_SIZE
+        self.map = mmap.mmap(self.file.fileno(), size)
+        self.used = HEADER.unpack_from(self.map, 0)[0] or HEADER.size
+        self.positions = {
+            key: offset
+            for key, _, offset in read_records(self.map, self.used)
+        }
+
+    def add_key(self, key):
+        encoded = key.encode()
+        value_offset = (self.used + KEY_LENGTH.size + len(encoded) + 7) & ~7
+        end = value_offset + VALUE.size
+        if end > len(self.map):
+            size = len(self.map)
+            while end > size:
+                size *= 2
+            self.map.close()
+            self.file.truncate(size)
+            self.map = mmap.mmap(self.file.fileno(), size)
+        KEY_LENGTH.pack_into(self.map, self.used, len(encoded))
+        start = self.used + KEY_LENGTH.size
+        self.map[start:start + len(encoded)] = encoded
+        VALUE.pack_into(self.map, value_offset, 0)
+        self.used = end
+        HEADER.pack_into(self.map, 0, self.used)
+        self.positions[key] = value_offset
+        return value_offset
+
+    def inc(self, key, amount):
+        with self.lock:
+            offset = self.positions.get(key) or self.add_key(key)
+            (value,) = VALUE.unpack_from(self.map, offset)
+            VALUE.pack_into(self.map, offset, value + amount)
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+def read_file(path):
+    """Пары ключ - значение из файла процесса"""
+    with open(path, 'rb') as file:
+        data = file.read()
+    if len(data) < HEADER.size:
+        return
+    used = min(HEADER.unpack_from(data, 0)[0], len(data))
+    for key, value, _ in read_records(data, used):
+        yield key, value
+
+
+_values = None
+_values_pid = None
+
+
+def get_values():
+    global _values, _values_pid
+    if _values_pid != os.getpid():
+        directory = Path(settings.METRICS_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        _values = MmapValues(directory / f'{os.getpid()}.db')
+        _values_pid = os.getpid()
+    return _values
+
+
+def sample_key(name, labels):
+    if not labels:
+        return name
+    return '{}{{{}}}'.format(name, ','.join(
+        '{}="{}"'.format(label, str(value).replace('"', '\\"'))
+        for label, value in sorted(labels.items())
+    ))
+
+
+def inc(name, amount=1, **labels):
+    if settings.METRICS_ENABLED:
+        get_values().inc(sample_key(name, labels), amount)
+
+
+def observe(name, value, **labels):
+    if not settings.METRICS_ENABLED:
+        return
+    values = get_values()
+    for bucket in BUCKETS:
+        if value <= bucket:
+            values.inc(
+                sample_key(name + '_bucket', {**labels, 'le': bucket}), 1
+            )
+    values.inc(sample_key(name + '_bucket', {**labels, 'le': '+Inf'}), 1)
+    values.inc(sample_key(name + '_sum', labels), value)
+    values.inc(sample_key(name + '_count', labels), 1)
+
+
+@contextmanager
+def timer(name, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def collect():
+    """Сумма значений всех процессов в текстовом формате Prometheus"""
+    totals = defaultdict(float)
+    for path in Path(settings.METRICS_DIR).glob('*.db'):
+        for key, value in read_file(path):
+            totals[key] += value
+
+    families = defaultdict(list)
+    for key, value in totals.items():
+        sample = key.split('{', 1)[0]
+        for family in METRICS:
+            if sample == family or sample.startswith(family + '_'):
+                families[family].append(f'{key} {value!r}')
+                break
+    lines = []
+    for family, (metric_type, description) in METRICS.items():
+        lines.append(f'# HELP {family} {description}')
+        lines.append(f'# TYPE {family} {metric_type}')
+        lines.extend(sorted(families[family]))
+    return '\n'.join(lines) + '\n'
+
+
+def clear():
+    """Удаляет файлы процессов прошлого запуска"""
+    for path in Path(settings.METRICS_DIR).glob('*.db'):
+        path.unlink(missing_ok=True)
+
+
+def mark_process_dead(pid):
+    """Переносит значения завершившегося процесса в общий файл.
+
+    Вызывается только мастером gunicorn, единственным, кто пишет в
+    ARCHIVE, так что счетчики не уменьшаются после перезапуска процесса.
+    """
+    path = Path(settings.METRICS_DIR) / f'{pid}.db'
+    if not path.exists():
+        return
+    archive = MmapValues(path.with_name(ARCHIVE))
+    try:
+        for key, value in read_file(path):
+            archive.inc(key, value)
+    finally:
+        archive.close()
+    path.unlink()
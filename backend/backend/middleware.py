@@ -0,0 +1,230 @@
+import cProfile
+import random
+import re
+import time
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from . import metrics
+from .nplusone import detect_n_plus_one
+
+_timings = ContextVar('timings', default=None)
+
+
+def record(metric, start):
+    """Добавляет время с момента start к метрике профилируемого запроса"""
+    timings = _timings.get()
+    if timings is not None:
+        timings[metric] += time.perf_counter() - start
+
+
+class TimedViewMixin:
+    """Время проверок (аутентификация, права, лимиты) и обработчика.
+
+    Подмешивается только к представлению профилируемого запроса, классы
+    DRF не изменяются.
+    """
+
+    handler_started = None
+
+    def initial(self, request, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            super().initial(request, *args, **kwargs)
+        finally:
+            record('auth', start)
+        self.handler_started = time.perf_counter()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if self.handler_started is not None:
+            record('view', self.handler_started)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+_timed_views = {}
+
+
+def timed_view(view_func):
+    """Представление DRF с TimedViewMixin вместо view_func"""
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return None
+    if view_func not in _timed_views:
+        timed_class = type(
+            view_class.__name__, (TimedViewMixin, view_class),
+            {'__module__': view_class.__module__}
+        )
+        actions = getattr(view_func, 'actions', None)
+        if actions:
+            view = timed_class.as_view(actions, **view_func.initkwargs)
+        else:
+            view = timed_class.as_view(**view_func.initkwargs)
+        _timed_views[view_func] = view
+    return _timed_views[view_func]
+
+
+def is_staff(request):
+    """Автор запроса - сотрудник; проверяется до вызова представления"""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.is_staff
+    try:
+        return Request(request, authenticators=[
+            authenticator()
+            for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES
+        ]).user.is_staff
+    except APIException:
+        return False
+
+
+class ProfilingMiddleware:
+    """Заголовок Server-Timing и выборочные дампы cProfile.
+
+    Включается настройкой PROFILING_ENABLED или заголовком
+    PROFILING_HEADER в запросе сотрудника. Представление DRF такого
+    запроса вызывается через timed_view, время рендеринга ответа
+    учитывается в process_template_response.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        header = 'HTTP_' + settings.PROFILING_HEADER.upper().replace('-', '_')
+        if not settings.PROFILING_ENABLED and (
+            header not in request.META or not is_staff(request)
+        ):
+            return self.get_response(request)
+
+        timings = {'db': 0, 'queries': 0, 'auth': 0, 'view': 0, 'render': 0}
+        token = _timings.set(timings)
+        profiler = None
+        if random.random() < settings.PROFILING_SAMPLE_RATE:
+            profiler = cProfile.Profile()
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(self.time_query(timings)):
+                if profiler:
+                    response = profiler.runcall(self.get_response, request)
+                else:
+                    response = self.get_response(request)
+        finally:
+            _timings.reset(token)
+        total = time.perf_counter() - start
+
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={timings["db"] * 1000:.1f};'
+            f'desc="{timings["queries"]} queries"',
+            f'auth;dur={timings["auth"] * 1000:.1f}',
+            f'view;dur={timings["view"] * 1000:.1f}',
+            f'render;dur={timings["render"] * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ))
+        if profiler:
+            self.dump(request, profiler)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if _timings.get() is None:
+            return None
+        view = timed_view(view_func)
+        if view is None:
+            return None
+        return view(request, *view_args, **view_kwargs)
+
+    def process_template_response(self, request, response):
+        if _timings.get() is not None:
+            start = time.perf_counter()
+            response.add_post_render_callback(
+                lambda response: record('render', start)
+            )
+        return response
+
+    @staticmethod
+    def time_query(timings):
+        def wrapper(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                timings['db'] += time.perf_counter() - start
+                timings['queries'] += 1
+
+        return wrapper
+
+    @staticmethod
+    def dump(request, profiler):
+        match = request.resolver_match
+        route = match.view_name if match else 'unresolved'
+        directory = Path(settings.PROFILING_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(directory / '{}-{}.prof'.format(
+            re.sub(r'[^\w.-]', '_', route),
+            datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        ))
+
+
+def view_label(request):
+    """Имя представления вида RecipeViewSet.list"""
+    match = request.resolver_match
+    if match is None:
+        return 'unresolved'
+    view_class = getattr(match.func, 'cls', None) or getattr(
+        match.func, 'view_class', None
+    )
+    if view_class is None:
+        return match.func.__name__
+    method = request.method.lower()
+    action = (getattr(match.func, 'actions', None) or {}).get(method)
+    return f'{view_class.__name__}.{action or method}'
+
+
+class MetricsMiddleware:
+    """Время ответа, статусы и число SQL-запросов по представлениям"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+
+        queries = []
+        start = time.perf_counter()
+        with connection.execute_wrapper(
+            lambda execute, *args: queries.append(1) or execute(*args)
+        ):
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        view = view_label(request)
+        metrics.inc(
+            'http_requests_total', view=view, status=response.status_code
+        )
+        metrics.observe('http_request_duration_seconds', duration, view=view)
+        metrics.inc('db_queries_total', len(queries), view=view)
+        return response
+
+
+class NPlusOneMiddleware:
+    """Сообщает о повторяющихся запросах (для разработки)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.NPLUSONE_ENABLED:
+            return self.get_response(request)
+        with detect_n_plus_one(
+            raise_error=settings.NPLUSONE_RAISE,
+            label=f'{request.method} {request.path}'
+        ):
+            return self.get_response(request)
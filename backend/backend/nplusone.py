@@ -0,0 +1,96 @@
+"""Поиск N+1 запросов: одинаковых SQL-запросов, повторяющихся в цикле.
+
+В тестах:
+
+    with detect_n_plus_one(threshold=3):
+        client.get('/api/recipes/')
+"""
+import logging
+import re
+import sys
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+
+from rest_framework.fields import Field
+
+logger = logging.getLogger(__name__)
+
+NORMALIZE = (
+    (re.compile(r'\s+'), ' '),
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\(\?(?:, \?)*\)'), '(?)'),
+)
+
+
+class NPlusOneError(Exception):
+    pass
+
+
+def fingerprint(sql):
+    for pattern, replacement in NORMALIZE:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def serializer_field(frame):
+    """Ближайшее поле сериализатора в стеке вызовов"""
+    while frame is not None:
+        field = frame.f_locals.get('self')
+        if isinstance(field, Field) and field.field_name:
+            return '{}.{}'.format(
+                type(field.parent).__name__, field.field_name
+            )
+        frame = frame.f_back
+    return None
+
+
+class QueryTracker:
+    """Считает запросы по отпечаткам и запоминает стек повторов"""
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.counts = Counter()
+        self.reports = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        key = fingerprint(sql)
+        self.counts[key] += 1
+        if self.counts[key] == self.threshold + 1:
+            frame = sys._getframe(1)
+            self.reports[key] = (
+                serializer_field(frame),
+                ''.join(traceback.format_stack(frame, limit=30)),
+            )
+        return execute(sql, params, many, context)
+
+    def problems(self):
+        return [
+            (key, self.counts[key], field, stack)
+            for key, (field, stack) in self.reports.items()
+        ]
+
+    def report(self, label=''):
+        return '\n\n'.join(
+            f'{label}: запрос выполнен {count} раз '
+            f'(поле {field or "не найдено"})\n{key}\n{stack}'
+            for key, count, field, stack in self.problems()
+        )
+
+
+@contextmanager
+def detect_n_plus_one(threshold=None, raise_error=True, label='N+1'):
+    tracker = QueryTracker(
+        settings.NPLUSONE_THRESHOLD if threshold is None else threshold
+    )
+    with connection.execute_wrapper(tracker):
+        yield tracker
+    if tracker.problems():
+        if raise_error:
+            raise NPlusOneError(tracker.report(label))
+        logger.warning(tracker.report(label))
@@ -0,0 +1,31 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+import backend.constants as const
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор, берущий размер большой таблицы из статистики Postgres.
+
+    Точный COUNT(*) выполняется только для отфильтрованных выборок и
+    для таблиц меньше ADMIN_ESTIMATED_COUNT_THRESHOLD строк.
+    """
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is None or query.where:
+            return super().count
+        connection = connections[self.object_list.db]
+        if connection.vendor != 'postgresql':
+            return super().count
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE relname = %s',
+                [self.object_list.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        if not row or row[0] < const.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+            return super().count
+        return int(row[0])
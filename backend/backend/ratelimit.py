@@ -0,0 +1,87 @@
+"""Корзины токенов, общие для всех процессов gunicorn на сервере.
+
+Состояние хранится в файле THROTTLE_FILE, отображенном в память:
+хеш-таблица с открытой адресацией из THROTTLE_TABLE_SIZE ячеек вида
+хеш ключа, число токенов, время последнего обновления. Изменения
+выполняются под блокировкой файла (flock) и потока.
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+import backend.constants as const
+
+SLOT = struct.Struct('Qdd')
+
+
+class TokenBuckets:
+    """Хеш-таблица корзин токенов в разделяемой памяти"""
+
+    def __init__(self, path, size):
+        self.lock = threading.Lock()
+        self.size = size
+        self.file = open(path, 'a+b')
+        if os.fstat(self.file.fileno()).st_size < size * SLOT.size:
+            self.file.truncate(size * SLOT.size)
+        self.map = mmap.mmap(self.file.fileno(), size * SLOT.size)
+
+    def find(self, key_hash, now, capacity, rate):
+        """Ячейка ключа, свободная или самая давно обновленная"""
+        start = key_hash % self.size
+        oldest, oldest_time = None, None
+        for probe in range(const.THROTTLE_MAX_PROBES):
+            offset = (start + probe) % self.size * SLOT.size
+            slot_hash, _, updated = SLOT.unpack_from(self.map, offset)
+            if slot_hash == key_hash:
+                return offset, True
+            # Корзина, успевшая наполниться, не отличается от пустой.
+            if not slot_hash or (now - updated) * rate >= capacity:
+                return offset, False
+            if oldest is None or updated < oldest_time:
+                oldest, oldest_time = offset, updated
+        return oldest, False
+
+    def consume(self, key, capacity, rate, cost=1):
+        """Списывает cost токенов, возвращает время ожидания или 0"""
+        key_hash = int.from_bytes(
+            hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little'
+        ) or 1
+        with self.lock:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+            try:
+                now = time.time()
+                offset, found = self.find(key_hash, now, capacity, rate)
+                tokens = capacity
+                if found:
+                    _, tokens, updated = SLOT.unpack_from(self.map, offset)
+                    tokens = min(capacity, tokens + (now - updated) * rate)
+                wait = 0
+                if tokens >= cost:
+                    tokens -= cost
+                else:
+                    wait = (cost - tokens) / rate
+                SLOT.pack_into(self.map, offset, key_hash, tokens, now)
+                return wait
+            finally:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+
+
+_buckets = None
+_buckets_pid = None
+
+
+def get_buckets():
+    global _buckets, _buckets_pid
+    if _buckets_pid != os.getpid():
+        path = Path(settings.THROTTLE_FILE)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        _buckets = TokenBuckets(path, const.THROTTLE_TABLE_SIZE)
+        _buckets_pid = os.getpid()
+    return _buckets
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 import os
+import tempfile
 from datetime import timedelta
 from pathlib import Path
 
@@ -38,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'djoser',
@@ -54,6 +56,9 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'backend.middleware.MetricsMiddleware',
+    'backend.middleware.ProfilingMiddleware',
+    'backend.middleware.NPlusOneMiddleware',
 ]
 
 ROOT_URLCONF = 'backend.urls'
@@ -91,6 +96,19 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'fragments',
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('FRAGMENT_CACHE_MAX_ENTRIES', 10000)),
+        },
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -119,7 +137,37 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'api.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.FastJSONParser',
+        'api.parsers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     "DEFAULT_PAGINATION_CLASS": "api.pagination.CustomPagination",
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.UserTokenBucketThrottle',
+        'api.throttling.IPTokenBucketThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'recipe_create': '20/min',
+        'recipe_create_ip': '60/min',
+        'recipe_bulk_create': '10/hour',
+        'recipe_list': '120/min',
+        'recipe_list_ip': '600/min',
+        'shopping_cart_download': '10/min',
+        'shopping_cart_download_ip': '30/min',
+        'batch': '60/min',
+        'batch_ip': '300/min',
+        'user_export': '5/hour',
+    },
+    # Перед приложением стоит один nginx (gateway), который заменяет
+    # X-Forwarded-For адресом клиента.
+    'NUM_PROXIES': 1,
 }
 
 
@@ -168,6 +216,57 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = '/media'
 
+# Request profiling: Server-Timing header and sampled cProfile dumps
+
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False') == 'True'
+
+PROFILING_HEADER = 'X-Profile'
+
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', 0))
+
+PROFILING_DIR = os.getenv('PROFILING_DIR', BASE_DIR / 'profiles')
+
+# Prometheus metrics shared by all worker processes
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'False') == 'True'
+
+METRICS_DIR = os.getenv(
+    'METRICS_DIR', os.path.join(tempfile.gettempdir(), 'foodgram-metrics')
+)
+
+# Token bucket throttling shared by all worker processes
+
+THROTTLE_ENABLED = os.getenv('THROTTLE_ENABLED', 'True') == 'True'
+
+THROTTLE_FILE = os.getenv(
+    'THROTTLE_FILE',
+    os.path.join(tempfile.gettempdir(), 'foodgram-throttle.db')
+)
+
+# Prebuilt tag and ingredient list responses (plain, gzip and brotli)
+
+CATALOGUE_DIR = os.getenv(
+    'CATALOGUE_DIR', os.path.join(tempfile.gettempdir(), 'foodgram-catalogue')
+)
+
+# N+1 query detector for development
+
+NPLUSONE_ENABLED = os.getenv('NPLUSONE_ENABLED', 'False') == 'True'
+
+NPLUSONE_THRESHOLD = int(os.getenv('NPLUSONE_THRESHOLD', 5))
+
+NPLUSONE_RAISE = os.getenv('NPLUSONE_RAISE', 'False') == 'True'
+
+# Default limits of API views (QueryLimitMixin), 0 disables the limit
+
+STATEMENT_TIMEOUT = int(os.getenv('STATEMENT_TIMEOUT', 5000))
+
+QUERY_BUDGET = int(os.getenv('QUERY_BUDGET', 50))
+
+# Startup import time budget for the import_time command, ms
+
+IMPORT_TIME_BUDGET = float(os.getenv('IMPORT_TIME_BUDGET', 1500))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -3,7 +3,10 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from .views import metrics_view
+
 urlpatterns = [
+    path('metrics', metrics_view),
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
 ]
@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+from . import metrics
+from .middleware import is_staff
+
+
+def metrics_view(request):
+    """Метрики для Prometheus, доступны сотрудникам (в том числе по токену)"""
+    if not settings.METRICS_ENABLED or not is_staff(request):
+        raise Http404
+    return HttpResponse(
+        metrics.collect(), content_type='text/plain; version=0.0.4'
+    )
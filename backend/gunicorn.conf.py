@@ -0,0 +1,24 @@
+"""Настройки gunicorn, загружаются из рабочего каталога автоматически"""
+import os
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+
+def on_starting(server):
+    from backend import metrics
+
+    metrics.clear()
+
+
+def child_exit(server, worker):
+    from backend import metrics
+
+    metrics.mark_process_dead(worker.pid)
+
+
+def post_worker_init(worker):
+    # Индекс ингредиентов строится фоновым потоком сразу после запуска
+    # процесса, а не в первом запросе к подбору рецептов.
+    from recipes.pantry import pantry_index
+
+    pantry_index.start()
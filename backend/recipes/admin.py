@@ -1,8 +1,12 @@
 from django.contrib import admin
 from django.contrib.auth.models import Group
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 
 from rest_framework.authtoken.models import TokenProxy as DRFToken
 
+from backend.admin import LargeTableAdmin
+
 from .models import (
     Favorite,
     Ingredient,
@@ -22,6 +26,9 @@ class TagAdmin(admin.ModelAdmin):
     list_display = (
         'name',
     )
+    search_fields = (
+        'name',
+    )
 
 
 @admin.register(Ingredient)
@@ -35,61 +42,155 @@ class IngredientAdmin(admin.ModelAdmin):
     )
 
 
+class RecipeIngredientInline(admin.TabularInline):
+    model = RecipeIngredient
+    autocomplete_fields = (
+        'ingredient',
+    )
+    extra = 0
+
+
+class RecipeTagInline(admin.TabularInline):
+    model = RecipeTag
+    autocomplete_fields = (
+        'tag',
+    )
+    extra = 0
+
+
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(LargeTableAdmin):
     list_display = (
         'name',
         'author',
+        'display_favorites',
     )
-    list_filter = (
+    list_select_related = (
         'author',
-        'tags'
+    )
+    list_filter = (
+        'tags',
     )
     search_fields = (
         'name',
+        'author__username',
+    )
+    autocomplete_fields = (
+        'author',
     )
     readonly_fields = (
         'display_favorites',
     )
+    inlines = (
+        RecipeIngredientInline,
+        RecipeTagInline,
+    )
+
+    def get_queryset(self, request):
+        favorites = Favorite.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            count=Count('id')
+        ).values('count')
+        return super().get_queryset(request).annotate(
+            favorites_count=Coalesce(
+                Subquery(favorites, output_field=IntegerField()), 0
+            )
+        )
 
     def display_favorites(self, obj):
-        return f'{obj.favorites.count()}'
+        return f'{obj.favorites_count}'
 
     display_favorites.short_description = 'Favorites count'
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        Recipe.objects.filter(pk=form.instance.pk).update_id_arrays()
+
+
+class RecipeLinkAdmin(LargeTableAdmin):
+    """Связи рецептов, изменения которых пересчитывают массивы id"""
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        Recipe.objects.filter(
+            pk__in=(obj.recipe_id, form.initial.get('recipe'))
+        ).update_id_arrays()
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        Recipe.objects.filter(pk=obj.recipe_id).update_id_arrays()
+
+    def delete_queryset(self, request, queryset):
+        recipe_ids = set(queryset.values_list('recipe_id', flat=True))
+        super().delete_queryset(request, queryset)
+        Recipe.objects.filter(pk__in=recipe_ids).update_id_arrays()
+
 
 @admin.register(RecipeTag)
-class RecipeTagAdmin(admin.ModelAdmin):
+class RecipeTagAdmin(RecipeLinkAdmin):
     list_display = (
         'id',
         'recipe',
         'tag',
     )
+    list_select_related = (
+        'recipe',
+        'tag',
+    )
+    autocomplete_fields = (
+        'recipe',
+        'tag',
+    )
 
 
 @admin.register(RecipeIngredient)
-class RecipeIngredientAdmin(admin.ModelAdmin):
+class RecipeIngredientAdmin(RecipeLinkAdmin):
     list_display = (
         'id',
         'recipe',
         'ingredient',
         'amount',
     )
+    list_select_related = (
+        'recipe',
+        'ingredient',
+    )
+    autocomplete_fields = (
+        'recipe',
+        'ingredient',
+    )
 
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(LargeTableAdmin):
     list_display = (
         'id',
         'user',
         'recipe',
     )
+    list_select_related = (
+        'user',
+        'recipe',
+    )
+    autocomplete_fields = (
+        'user',
+        'recipe',
+    )
 
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(LargeTableAdmin):
     list_display = (
         'id',
         'user',
         'recipe',
     )
+    list_select_related = (
+        'user',
+        'recipe',
+    )
+    autocomplete_fields = (
+        'user',
+        'recipe',
+    )
@@ -0,0 +1,155 @@
+from django.db import connection
+from django.db.models import Exists, OuterRef, Subquery
+
+import backend.constants as const
+from users.models import UserSubscription
+
+from .models import FeedEntry, Recipe
+
+
+def is_fan_out_author(author_id):
+    """Автор, чьи рецепты раскладываются по лентам подписчиков при записи"""
+    return not UserSubscription.objects.filter(
+        subscription_id=author_id
+    )[const.FEED_FANOUT_MAX_SUBSCRIBERS:].exists()
+
+
+def crossed_fan_out_threshold(author_id, subscribed):
+    """Число подписчиков автора только что перешло FEED_FANOUT_MAX_SUBSCRIBERS.
+
+    После подписки порог перейден, если подписчиков стало на одного больше
+    порога, после отписки - если их стало ровно столько, сколько порог.
+    Читается не больше двух строк подписок.
+    """
+    count = const.FEED_FANOUT_MAX_SUBSCRIBERS + int(subscribed)
+    return UserSubscription.objects.filter(
+        subscription_id=author_id
+    )[count - 1:count + 1].count() == 1
+
+
+def trim_feeds(user_ids):
+    """Оставляет в лентах пользователей не больше FEED_MAX_LENGTH записей"""
+    oldest_kept = FeedEntry.objects.filter(
+        user=OuterRef('user')
+    ).order_by('-recipe_id').values('recipe_id')[
+        const.FEED_MAX_LENGTH - 1:const.FEED_MAX_LENGTH
+    ]
+    FeedEntry.objects.filter(
+        user_id__in=user_ids,
+        recipe_id__lt=Subquery(oldest_kept)
+    ).delete()
+
+
+def fan_out_recipes(author_id, recipes):
+    """Добавляет новые рецепты автора в ленты его подписчиков"""
+    if not recipes or not is_fan_out_author(author_id):
+        return
+    user_ids = list(UserSubscription.objects.filter(
+        subscription_id=author_id
+    ).values_list('user_id', flat=True))
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(user_id=user_id, recipe=recipe)
+            for user_id in user_ids
+            for recipe in recipes[-const.FEED_MAX_LENGTH:]
+        ],
+        batch_size=const.FEED_MAX_LENGTH,
+        ignore_conflicts=True
+    )
+    trim_feeds(user_ids)
+
+
+def fan_out_recipe(recipe):
+    """Добавляет новый рецепт в ленты подписчиков автора"""
+    fan_out_recipes(recipe.author_id, [recipe])
+
+
+def backfill_author(author):
+    """Заполняет ленты всех подписчиков последними рецептами автора.
+
+    Нужна, когда автор возвращается под порог раскладки: пока подписчиков
+    было больше, его рецепты читались из таблицы рецептов и в ленты
+    не попадали.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {FeedEntry._meta.db_table} (user_id, recipe_id) '
+            f'SELECT subscription.user_id, recipe.id '
+            f'FROM {UserSubscription._meta.db_table} AS subscription '
+            f'CROSS JOIN (SELECT id FROM {Recipe._meta.db_table} '
+            f'WHERE author_id = %s ORDER BY id DESC LIMIT %s) AS recipe '
+            f'WHERE subscription.subscription_id = %s '
+            f'ON CONFLICT DO NOTHING',
+            [author.id, const.FEED_MAX_LENGTH, author.id]
+        )
+    trim_feeds(UserSubscription.objects.filter(
+        subscription=author
+    ).values('user_id'))
+
+
+def backfill_subscription(user, author):
+    """Заполняет ленту последними рецептами нового автора из подписок.
+
+    Если с этой подпиской автор перешел порог раскладки, его рецепты
+    убираются из всех лент: дальше они читаются из таблицы рецептов.
+    """
+    if crossed_fan_out_threshold(author.id, subscribed=True):
+        FeedEntry.objects.filter(recipe__author=author).delete()
+        return
+    if not is_fan_out_author(author.id):
+        return
+    recipe_ids = Recipe.objects.filter(author=author).order_by(
+        '-id'
+    ).values_list('id', flat=True)[:const.FEED_MAX_LENGTH]
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(user=user, recipe_id=recipe_id)
+         for recipe_id in recipe_ids],
+        ignore_conflicts=True
+    )
+    trim_feeds([user.id])
+
+
+def remove_subscription(user, author):
+    """Убирает из ленты рецепты автора после отписки.
+
+    Если после отписки автор вернулся под порог раскладки, ленты
+    остальных подписчиков заполняются его последними рецептами.
+    """
+    FeedEntry.objects.filter(user=user, recipe__author=author).delete()
+    if crossed_fan_out_threshold(author.id, subscribed=False):
+        backfill_author(author)
+
+
+def fan_out_on_read_authors(user):
+    """Авторы из подписок пользователя, чьи рецепты не попадают в ленты"""
+    return list(UserSubscription.objects.filter(user=user).filter(Exists(
+        UserSubscription.objects.filter(
+            subscription=OuterRef('subscription')
+        )[const.FEED_FANOUT_MAX_SUBSCRIBERS:]
+    )).values_list('subscription_id', flat=True))
+
+
+def feed_recipe_ids(user, position=None, reverse=False, limit=None):
+    """Идентификаторы рецептов ленты после position в порядке обхода.
+
+    Лента читается по убыванию id, reverse - в обратную сторону. Записи
+    ленты и рецепты популярных авторов выбираются отдельными запросами
+    по индексам, каждый не больше limit строк, и объединяются в памяти.
+    """
+    limit = limit or const.FEED_PAGE_SIZE
+    lookup, ordering = ('gt', '') if reverse else ('lt', '-')
+    entries = FeedEntry.objects.filter(user=user)
+    if position is not None:
+        entries = entries.filter(**{f'recipe_id__{lookup}': position})
+    recipe_ids = set(entries.order_by(
+        f'{ordering}recipe_id'
+    ).values_list('recipe_id', flat=True)[:limit])
+    authors = fan_out_on_read_authors(user)
+    if authors:
+        recipes = Recipe.objects.filter(author_id__in=authors)
+        if position is not None:
+            recipes = recipes.filter(**{f'id__{lookup}': position})
+        recipe_ids.update(recipes.order_by(
+            f'{ordering}id'
+        ).values_list('id', flat=True)[:limit])
+    return sorted(recipe_ids, reverse=not reverse)[:limit]
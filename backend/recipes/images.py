@@ -0,0 +1,32 @@
+import base64
+import os
+
+from django.db import transaction
+
+
+def write_image(path, data):
+    """Сохраняет изображение из base64 (выполняется в дочернем процессе)"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as file:
+        file.write(base64.b64decode(data))
+    return path
+
+
+def save_image_on_commit(field, content):
+    """Имя нового файла поля; сам файл записывается после фиксации.
+
+    Если транзакция откатится, файл не будет записан и не останется
+    на диске без рецепта.
+    """
+    name = field.storage.get_available_name(
+        field.generate_filename(None, content.name)
+    )
+    transaction.on_commit(lambda: field.storage.save(name, content))
+    return name
+
+
+def delete_image_on_commit(file):
+    """Удаляет старый файл поля только после фиксации транзакции"""
+    if file:
+        name, storage = file.name, file.storage
+        transaction.on_commit(lambda: storage.delete(name))
@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+import backend.constants as const
+from recipes.models import ChangeLogEntry
+
+
+class Command(BaseCommand):
+    help = (
+        "Remove change log entries superseded by later changes of the same "
+        "object and deletions older than the retention period. "
+        "Intended to be run on a schedule (e.g. daily from cron)."
+    )
+
+    def handle(self, *args, **options):
+        superseded, expired = ChangeLogEntry.objects.compact(
+            timezone.now() - timedelta(days=const.CHANGES_RETENTION_DAYS)
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Removed {superseded} superseded and {expired} expired entries."
+        ))
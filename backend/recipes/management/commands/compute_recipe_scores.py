@@ -0,0 +1,66 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDay
+from django.utils import timezone
+
+import backend.constants as const
+from recipes.models import Favorite, RecipeScore, ShoppingCart
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute trending and popular recipe scores. "
+        "Intended to be run on a schedule (e.g. hourly from cron)."
+    )
+
+    def get_trending(self, now):
+        since = now - timedelta(days=const.TRENDING_WINDOW_DAYS)
+        scores = defaultdict(float)
+        for model, weight in (
+            (Favorite, 1),
+            (ShoppingCart, const.TRENDING_SHOPPING_CART_WEIGHT),
+        ):
+            rows = model.objects.filter(created__gte=since).annotate(
+                day=TruncDay('created')
+            ).order_by().values('recipe_id', 'day').annotate(
+                count=Count('id')
+            )
+            for row in rows.iterator():
+                age = (now - row['day']).total_seconds() / 86400
+                scores[row['recipe_id']] += weight * row['count'] * 0.5 ** (
+                    age / const.TRENDING_HALF_LIFE_DAYS
+                )
+        return scores
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        trending = self.get_trending(now)
+        popular = dict(
+            Favorite.objects.order_by().values('recipe_id').annotate(
+                count=Count('id')
+            ).values_list('recipe_id', 'count').iterator()
+        )
+        with transaction.atomic():
+            RecipeScore.objects.all().delete()
+            RecipeScore.objects.bulk_create(
+                (
+                    RecipeScore(
+                        recipe_id=recipe_id,
+                        trending=trending.get(recipe_id, 0),
+                        popular=popular.get(recipe_id, 0),
+                        computed_at=now
+                    )
+                    for recipe_id in trending.keys() | popular.keys()
+                ),
+                batch_size=1000
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Finished computing scores for "
+                f"{len(trending.keys() | popular.keys())} recipes."
+            )
+        )
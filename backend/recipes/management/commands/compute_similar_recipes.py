@@ -0,0 +1,133 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+import backend.constants as const
+from recipes.models import Recipe, RecipeIngredient, RecipeNeighbour, RecipeTag
+from recipes.similarity import SimilarityIndex, compute_batch, init_worker
+
+
+class Command(BaseCommand):
+    help = (
+        "Precompute similar recipes by ingredient and tag overlap. "
+        "--incremental recomputes edited recipes and recipes sharing an "
+        "ingredient with them; ingredient weights still drift, so a full "
+        "run is intended to be scheduled as well (e.g. nightly from cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help=(
+                "Recompute only recipes edited since the last run and "
+                "their possible neighbours."
+            )
+        )
+        parser.add_argument(
+            "--count",
+            type=int,
+            default=const.SIMILAR_RECIPES_COUNT,
+            help="Number of neighbours to store per recipe."
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=const.SIMILARITY_BATCH_SIZE,
+            help="Number of recipes per worker task."
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Number of worker processes."
+        )
+
+    def get_recipe_ids(self, incremental, index):
+        last_run = RecipeNeighbour.objects.aggregate(
+            last_run=Max('computed_at')
+        )['last_run']
+        if not incremental or last_run is None:
+            return list(Recipe.objects.values_list('id', flat=True))
+        edited = set(Recipe.objects.filter(
+            updated__gte=last_run
+        ).values_list('id', flat=True))
+        recipe_ids = index.related(edited) | edited
+        recipe_ids.update(RecipeNeighbour.objects.filter(
+            neighbour_id__in=edited
+        ).values_list('recipe_id', flat=True))
+        return sorted(recipe_ids)
+
+    def save_batch(self, results, computed_at):
+        with transaction.atomic():
+            RecipeNeighbour.objects.filter(
+                recipe_id__in=[recipe_id for recipe_id, _ in results]
+            ).delete()
+            RecipeNeighbour.objects.bulk_create([
+                RecipeNeighbour(
+                    recipe_id=recipe_id,
+                    neighbour_id=neighbour_id,
+                    score=score,
+                    computed_at=computed_at
+                )
+                for recipe_id, neighbours in results
+                for score, neighbour_id in neighbours
+            ])
+
+    def handle(self, *args, **options):
+        computed_at = timezone.now()
+        index = SimilarityIndex(
+            RecipeIngredient.objects.values_list(
+                'recipe_id', 'ingredient_id'
+            ).iterator(),
+            RecipeTag.objects.filter(tag__isnull=False).values_list(
+                'recipe_id', 'tag_id'
+            ).iterator()
+        )
+        recipe_ids = self.get_recipe_ids(options["incremental"], index)
+        self.stdout.write(f"Recipes to recompute: {len(recipe_ids)}.")
+        if not recipe_ids:
+            return
+
+        batch_size = options["batch_size"]
+        batches = [
+            recipe_ids[start:start + batch_size]
+            for start in range(0, len(recipe_ids), batch_size)
+        ]
+
+        done = 0
+        if options["workers"] > 1:
+            executor = ProcessPoolExecutor(
+                max_workers=options["workers"],
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker,
+                initargs=(index,)
+            )
+            results = executor.map(
+                compute_batch, batches, repeat(options["count"])
+            )
+        else:
+            executor = None
+            init_worker(index)
+            results = map(compute_batch, batches, repeat(options["count"]))
+
+        try:
+            for batch_results in results:
+                self.save_batch(batch_results, computed_at)
+                done += len(batch_results)
+                self.stdout.write(f"Processed {done}/{len(recipe_ids)}.")
+        finally:
+            if executor:
+                executor.shutdown()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Finished computing similar recipes for {done} recipes."
+            )
+        )
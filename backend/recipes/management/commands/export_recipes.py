@@ -0,0 +1,137 @@
+import base64
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import prefetch_related_objects
+
+from recipes.models import Recipe
+
+
+def last_exported_id(path):
+    """id рецепта в последней полной строке ранее выгруженного файла.
+
+    Строка, запись которой прервалась, обрезается: выгрузка продолжится
+    с этого рецепта.
+    """
+    with open(path, 'rb+') as file:
+        end = file.seek(0, os.SEEK_END)
+        position = end
+        tail = b''
+        while position > 0 and tail.count(b'\n') < 2:
+            step = min(position, 1 << 16)
+            position -= step
+            file.seek(position)
+            tail = file.read(step) + tail
+        complete = tail.rfind(b'\n') + 1
+        if position + complete < end:
+            file.truncate(position + complete)
+            tail = tail[:complete]
+    lines = tail.strip().splitlines()
+    return json.loads(lines[-1])['id'] if lines else 0
+
+
+class Command(BaseCommand):
+    help = "Export recipes with authors, tags and ingredients as NDJSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output", type=str, required=True,
+            help="Specify the NDJSON file path."
+        )
+        parser.add_argument(
+            "--inline-images", action="store_true",
+            help="Embed image bytes as base64 instead of media paths."
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=500,
+            help="Number of recipes fetched per server-side cursor chunk."
+        )
+        parser.add_argument(
+            "--resume", action="store_true",
+            help="Append recipes after the last one in the output file."
+        )
+
+    def serialize(self, recipe, inline_images):
+        image = {'path': recipe.image.name}
+        if inline_images:
+            with recipe.image.open('rb') as file:
+                image['data'] = base64.b64encode(file.read()).decode()
+        return {
+            'id': recipe.id,
+            'name': recipe.name,
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+            'author': {
+                'username': recipe.author.username,
+                'email': recipe.author.email,
+                'first_name': recipe.author.first_name,
+                'last_name': recipe.author.last_name,
+            },
+            'tags': [
+                {
+                    'name': recipe_tag.tag.name,
+                    'color': recipe_tag.tag.color,
+                    'slug': recipe_tag.tag.slug,
+                }
+                for recipe_tag in recipe.recipe_tags.all() if recipe_tag.tag
+            ],
+            'ingredients': [
+                {
+                    'name': recipe_ingredient.ingredient.name,
+                    'measurement_unit':
+                        recipe_ingredient.ingredient.measurement_unit,
+                    'amount': recipe_ingredient.amount,
+                }
+                for recipe_ingredient in recipe.ingredients.all()
+            ],
+            'image': image,
+        }
+
+    def write_chunk(self, file, chunk, inline_images):
+        prefetch_related_objects(
+            chunk, 'recipe_tags__tag', 'ingredients__ingredient'
+        )
+        for recipe in chunk:
+            file.write(json.dumps(
+                self.serialize(recipe, inline_images), ensure_ascii=False
+            ) + '\n')
+
+    def handle(self, *args, **options):
+        path = options["output"]
+        start_id = 0
+        if options["resume"]:
+            if not os.path.exists(path):
+                raise CommandError(f"File {path} does not exist.")
+            start_id = last_exported_id(path)
+
+        recipes = Recipe.objects.filter(id__gt=start_id).select_related(
+            'author'
+        ).order_by('id')
+        total = recipes.count()
+        self.stdout.write(f"Exporting {total} recipes after id {start_id}...")
+
+        exported = 0
+        started = time.monotonic()
+        chunk_size = options["chunk_size"]
+        with open(path, 'a' if options["resume"] else 'w',
+                  encoding='utf-8') as file:
+            chunk = []
+            for recipe in recipes.iterator(chunk_size=chunk_size):
+                chunk.append(recipe)
+                if len(chunk) == chunk_size:
+                    self.write_chunk(file, chunk, options["inline_images"])
+                    exported += len(chunk)
+                    chunk = []
+                    self.stdout.write(
+                        f"Exported {exported}/{total} "
+                        f"({exported / (time.monotonic() - started):.0f}/s)."
+                    )
+            if chunk:
+                self.write_chunk(file, chunk, options["inline_images"])
+                exported += len(chunk)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Finished exporting {exported} recipes.")
+        )
@@ -3,6 +3,7 @@ import os
 
 from django.core.management.base import BaseCommand, CommandError
 
+from api.catalogue import ingredient_snapshot
 from recipes.models import Ingredient
 
 
@@ -45,6 +46,7 @@ class Command(BaseCommand):
                             f"Error: - {error}"
                         )
                     )
+        ingredient_snapshot.invalidate()
         self.stdout.write(
             self.style.SUCCESS(
                 f"Finished importing data for Ingredient model.\n"
@@ -0,0 +1,234 @@
+import json
+import multiprocessing
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, wait
+from itertools import islice
+from uuid import uuid4
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.catalogue import ingredient_snapshot, tag_snapshot
+from recipes.feed import fan_out_recipes
+from recipes.images import write_image
+from recipes.models import Ingredient, Recipe, RecipeIngredient, RecipeTag, Tag
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Import recipes from an NDJSON file created by export_recipes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--input", type=str, required=True,
+            help="Specify the NDJSON file path."
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=500,
+            help="Number of recipes inserted per transaction."
+        )
+        parser.add_argument(
+            "--workers", type=int, default=os.cpu_count(),
+            help="Number of processes writing images."
+        )
+        parser.add_argument(
+            "--resume", action="store_true",
+            help="Skip lines committed by a previous interrupted run."
+        )
+        parser.add_argument(
+            "--state", type=str,
+            help="Progress file path (defaults to <input>.state)."
+        )
+
+    def get_authors(self, records):
+        """id авторов по username.
+
+        Автор, чей email уже занят пользователем с другим username,
+        не создается: его рецепты пропускаются с предупреждением.
+        """
+        authors = {record['author']['username']: record['author']
+                   for record in records}
+        existing = set(User.objects.filter(
+            username__in=authors
+        ).values_list('username', flat=True))
+        taken = dict(User.objects.filter(
+            email__in=[author['email'] for username, author
+                       in authors.items() if username not in existing]
+        ).values_list('email', 'username'))
+        new_users = []
+        for username, author in authors.items():
+            if username in existing:
+                continue
+            if author['email'] in taken:
+                self.stdout.write(self.style.WARNING(
+                    f"Skipping recipes of {username}: email "
+                    f"{author['email']} belongs to {taken[author['email']]}."
+                ))
+                continue
+            taken[author['email']] = username
+            user = User(**author)
+            user.set_unusable_password()
+            new_users.append(user)
+        User.objects.bulk_create(new_users)
+        return dict(User.objects.filter(
+            username__in=existing | {user.username for user in new_users}
+        ).values_list('username', 'id'))
+
+    def get_tags(self, records):
+        tags = {tag['slug']: tag
+                for record in records for tag in record['tags']}
+        existing = dict(Tag.objects.filter(
+            slug__in=tags
+        ).values_list('slug', 'id'))
+        for slug, tag in tags.items():
+            if slug not in existing:
+                existing[slug] = Tag.objects.create(**tag).id
+        return existing
+
+    def get_ingredients(self, records):
+        keys = {
+            (ingredient['name'], ingredient['measurement_unit'])
+            for record in records for ingredient in record['ingredients']
+        }
+        Ingredient.objects.bulk_create(
+            [Ingredient(name=name, measurement_unit=unit)
+             for name, unit in keys],
+            ignore_conflicts=True
+        )
+        return {
+            (name, unit): ingredient_id
+            for ingredient_id, name, unit in Ingredient.objects.filter(
+                name__in={name for name, _ in keys}
+            ).values_list('id', 'name', 'measurement_unit')
+        }
+
+    def save_images(self, pool, records):
+        """Запускает запись изображений и возвращает их имена"""
+        names, futures = [], {}
+        for record in records:
+            image = record['image']
+            name = image['path']
+            if 'data' in image:
+                extension = os.path.splitext(name)[1] or '.jpg'
+                name = f'recipes/images/{uuid4().hex[:12]}{extension}'
+                futures[name] = pool.submit(
+                    write_image, default_storage.path(name), image['data']
+                )
+            names.append(name)
+        return names, futures
+
+    def import_batch(self, pool, records):
+        """Импортирует пачку и возвращает число сохраненных рецептов"""
+        authors = self.get_authors(records)
+        records = [record for record in records
+                   if record['author']['username'] in authors]
+        if not records:
+            return 0
+        images, futures = self.save_images(pool, records)
+        try:
+            self.insert_batch(records, authors, images, futures)
+        except BaseException:
+            # Рецепты пачки не сохранены: записанные для них изображения
+            # удаляются, повторный запуск запишет их заново.
+            wait(futures.values())
+            for name in futures:
+                default_storage.delete(name)
+            raise
+        return len(records)
+
+    def insert_batch(self, records, authors, images, futures):
+        tags = self.get_tags(records)
+        ingredients = self.get_ingredients(records)
+        for future in futures.values():
+            future.result()
+
+        with transaction.atomic():
+            recipes = Recipe.objects.bulk_create(
+                Recipe(
+                    name=record['name'],
+                    text=record['text'],
+                    cooking_time=record['cooking_time'],
+                    author_id=authors[record['author']['username']],
+                    image=image,
+                    ingredient_ids=sorted({
+                        ingredients[(
+                            ingredient['name'], ingredient['measurement_unit']
+                        )]
+                        for ingredient in record['ingredients']
+                    }),
+                    tag_ids=sorted({
+                        tags[tag['slug']] for tag in record['tags']
+                    }),
+                )
+                for record, image in zip(records, images)
+            )
+            RecipeTag.objects.bulk_create(
+                RecipeTag(recipe=recipe, tag_id=tags[tag['slug']])
+                for recipe, record in zip(recipes, records)
+                for tag in record['tags']
+            )
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe,
+                    ingredient_id=ingredients[
+                        (ingredient['name'], ingredient['measurement_unit'])
+                    ],
+                    amount=ingredient['amount'],
+                )
+                for recipe, record in zip(recipes, records)
+                for ingredient in record['ingredients']
+            )
+            # bulk_create не вызывает сигналы: рецепты раскладываются
+            # по лентам подписчиков здесь.
+            by_author = defaultdict(list)
+            for recipe in recipes:
+                by_author[recipe.author_id].append(recipe)
+            for author_id, author_recipes in by_author.items():
+                fan_out_recipes(author_id, author_recipes)
+
+    def handle(self, *args, **options):
+        path = options["input"]
+        if not os.path.exists(path):
+            raise CommandError(f"File {path} does not exist.")
+        state_path = options["state"] or f"{path}.state"
+
+        done = 0
+        if options["resume"] and os.path.exists(state_path):
+            with open(state_path, encoding="utf-8") as file:
+                done = json.load(file)["lines"]
+            self.stdout.write(f"Resuming after line {done}...")
+
+        imported = 0
+        started = time.monotonic()
+        batch_size = options["batch_size"]
+        # Процессы запускаются через spawn: fork унаследовал бы
+        # соединение с базой данных.
+        with open(path, encoding="utf-8") as file, ProcessPoolExecutor(
+            max_workers=options["workers"],
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as pool:
+            lines = islice(file, done, None)
+            while True:
+                batch = list(islice(lines, batch_size))
+                if not batch:
+                    break
+                records = [json.loads(line) for line in batch if line.strip()]
+                if records:
+                    imported += self.import_batch(pool, records)
+                done += len(batch)
+                with open(state_path, "w", encoding="utf-8") as state:
+                    json.dump({"lines": done}, state)
+                self.stdout.write(
+                    f"Imported {imported} recipes, line {done} "
+                    f"({imported / (time.monotonic() - started):.0f}/s)."
+                )
+
+        # Ингредиенты создаются через bulk_create, без сигналов.
+        ingredient_snapshot.invalidate()
+        tag_snapshot.invalidate()
+        self.stdout.write(
+            self.style.SUCCESS(f"Finished importing {imported} recipes.")
+        )
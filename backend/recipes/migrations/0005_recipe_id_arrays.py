@@ -0,0 +1,50 @@
+# Generated by Django 3.2 on 2026-10-19 12:00
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipescore'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredient_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), default=list, editable=False, size=None, verbose_name='id ингредиентов'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='tag_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), default=list, editable=False, size=None, verbose_name='id тегов'),
+        ),
+        migrations.RunSQL(
+            """
+            UPDATE recipes_recipe SET
+                ingredient_ids = COALESCE((
+                    SELECT array_agg(ingredient_id ORDER BY ingredient_id)
+                    FROM recipes_recipeingredient
+                    WHERE recipe_id = recipes_recipe.id
+                ), '{}'),
+                tag_ids = COALESCE((
+                    SELECT array_agg(tag_id ORDER BY tag_id)
+                    FROM recipes_recipetag
+                    WHERE recipe_id = recipes_recipe.id
+                        AND tag_id IS NOT NULL
+                ), '{}')
+            """,
+            migrations.RunSQL.noop
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['ingredient_ids'], name='recipe_ingredient_ids_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['tag_ids'], name='recipe_tag_ids_gin'),
+        ),
+    ]
@@ -0,0 +1,101 @@
+# Generated by Django 3.2 on 2026-10-19 12:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+TRIGGERS = (
+    ('recipes_recipe', 'recipe', 'id', ''),
+    ('recipes_favorite', 'favorite', 'recipe_id', 'user_id'),
+    ('recipes_shoppingcart', 'shopping_cart', 'recipe_id', 'user_id'),
+    ('users_usersubscription', 'subscription', 'subscription_id', 'user_id'),
+)
+
+CREATE_FUNCTION = """
+CREATE FUNCTION recipes_log_change() RETURNS trigger AS $$
+DECLARE
+    changed jsonb;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed := to_jsonb(OLD);
+    ELSE
+        changed := to_jsonb(NEW);
+    END IF;
+    INSERT INTO recipes_changelogentry
+        (kind, action, object_id, user_id, xid, created)
+    VALUES (
+        TG_ARGV[0], lower(TG_OP), (changed ->> TG_ARGV[1])::bigint,
+        (changed ->> TG_ARGV[2])::bigint, txid_current(), clock_timestamp()
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def create_triggers():
+    statements = [CREATE_FUNCTION]
+    for table, kind, object_column, user_column in TRIGGERS:
+        arguments = f"'{kind}', '{object_column}', '{user_column}'"
+        statements.append(
+            f"CREATE TRIGGER {table}_log_change "
+            f"AFTER INSERT OR DELETE ON {table} FOR EACH ROW "
+            f"EXECUTE PROCEDURE recipes_log_change({arguments});"
+        )
+    statements.append(
+        "CREATE TRIGGER recipes_recipe_log_update "
+        "AFTER UPDATE ON recipes_recipe FOR EACH ROW "
+        "WHEN (OLD.* IS DISTINCT FROM NEW.*) "
+        "EXECUTE PROCEDURE recipes_log_change('recipe', 'id', '');"
+    )
+    return statements
+
+
+def drop_triggers():
+    statements = [
+        f"DROP TRIGGER {table}_log_change ON {table};"
+        for table, *_ in TRIGGERS
+    ]
+    statements.append(
+        "DROP TRIGGER recipes_recipe_log_update ON recipes_recipe;"
+    )
+    statements.append("DROP FUNCTION recipes_log_change();")
+    return statements
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0005_recipe_id_arrays'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('recipe', 'Рецепт'), ('favorite', 'Избранное'), ('shopping_cart', 'Список покупок'), ('subscription', 'Подписка')], max_length=16, verbose_name='Тип объекта')),
+                ('action', models.CharField(choices=[('insert', 'Добавление'), ('update', 'Изменение'), ('delete', 'Удаление')], max_length=8, verbose_name='Действие')),
+                ('object_id', models.BigIntegerField(verbose_name='id объекта')),
+                ('xid', models.BigIntegerField(verbose_name='Транзакция')),
+                ('created', models.DateTimeField(verbose_name='Дата изменения')),
+                ('user', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'изменение',
+                'verbose_name_plural': 'Журнал изменений',
+                'ordering': ('xid', 'id'),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='changelogentry',
+            index=models.Index(fields=['xid', 'id'], name='change_cursor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='changelogentry',
+            index=models.Index(fields=['kind', 'object_id'], name='change_object_idx'),
+        ),
+        migrations.RunSQL(create_triggers(), drop_triggers()),
+    ]
@@ -1,5 +1,11 @@
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import connections, models
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
 import backend.constants as const
 from users.models import User
@@ -68,6 +74,29 @@ class RecipeQuerySet(models.QuerySet):
             is_in_shopping_cart=models.Exists(user_shopping_cart)
         )
 
+    def update_id_arrays(self):
+        """Пересчитывает ingredient_ids и tag_ids по таблицам связей"""
+
+        def ids(model, field):
+            return Coalesce(
+                models.Subquery(
+                    model.objects.filter(
+                        recipe=models.OuterRef('pk'),
+                        **{f'{field}__isnull': False}
+                    ).order_by().values('recipe').annotate(
+                        ids=ArrayAgg(field, ordering=field)
+                    ).values('ids')
+                ),
+                models.Value([]),
+                output_field=ArrayField(models.BigIntegerField())
+            )
+
+        return self.update(
+            ingredient_ids=ids(RecipeIngredient, 'ingredient_id'),
+            tag_ids=ids(RecipeTag, 'tag_id'),
+            updated=timezone.now()
+        )
+
 
 class Recipe(models.Model):
     """Модель рецепта"""
@@ -95,17 +124,86 @@ class Recipe(models.Model):
         through='RecipeTag',
         verbose_name='Теги',
     )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Дата создания'
+    )
+    updated = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name='Дата изменения'
+    )
+    ingredient_ids = ArrayField(
+        models.BigIntegerField(),
+        default=list,
+        editable=False,
+        verbose_name='id ингредиентов'
+    )
+    tag_ids = ArrayField(
+        models.BigIntegerField(),
+        default=list,
+        editable=False,
+        verbose_name='id тегов'
+    )
     objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = "рецепт"
         verbose_name_plural = "Рецепты"
         ordering = ('-id',)
+        indexes = [
+            GinIndex(
+                fields=['ingredient_ids'], name='recipe_ingredient_ids_gin'
+            ),
+            GinIndex(fields=['tag_ids'], name='recipe_tag_ids_gin'),
+        ]
 
     def __str__(self):
         return self.name
 
 
+class UserRecipeCollectionQuerySet(models.QuerySet):
+    def add(self, user_id, recipe_ids):
+        """Добавляет рецепты одним запросом INSERT ... ON CONFLICT.
+
+        Возвращает словарь id -> (рецепт, добавлен ли он этим запросом)
+        только для существующих рецептов.
+        """
+        fields = ('id', 'name', 'cooking_time', 'image')
+        sql = f"""
+            WITH recipes AS (
+                SELECT {', '.join(fields)} FROM {Recipe._meta.db_table}
+                WHERE id = ANY(%s)
+            ), added AS (
+                INSERT INTO {self.model._meta.db_table}
+                    (user_id, recipe_id, created)
+                SELECT %s, id, %s FROM recipes
+                ON CONFLICT DO NOTHING
+                RETURNING recipe_id
+            )
+            SELECT recipes.*, id IN (SELECT recipe_id FROM added)
+            FROM recipes
+        """
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql, [list(recipe_ids), user_id, timezone.now()])
+            return {
+                row[0]: (Recipe.from_db(self.db, fields, row[:-1]), row[-1])
+                for row in cursor.fetchall()
+            }
+
+    def remove(self, user_id, recipe_ids):
+        """Удаляет рецепты одним запросом, возвращает id удаленных"""
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {self.model._meta.db_table} "
+                "WHERE user_id = %s AND recipe_id = ANY(%s) "
+                "RETURNING recipe_id",
+                [user_id, list(recipe_ids)]
+            )
+            return {row[0] for row in cursor.fetchall()}
+
+
 class UserRecipeCollection(models.Model):
     """Абстрактный класс для моделей списка покупок и избранного"""
 
@@ -119,6 +217,13 @@ class UserRecipeCollection(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Пользователь',
     )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Дата добавления'
+    )
+
+    objects = UserRecipeCollectionQuerySet.as_manager()
 
     class Meta:
         default_related_name = '%(class)s'
@@ -197,3 +302,187 @@ class RecipeIngredient(models.Model):
         verbose_name = "ингредиент рецепта"
         verbose_name_plural = "Ингредиенты рецептов"
         ordering = ('id',)
+
+
+class FeedEntry(models.Model):
+    """Лента рецептов от авторов, на которых подписан пользователь"""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Пользователь',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт',
+    )
+
+    class Meta:
+        verbose_name = 'запись ленты'
+        verbose_name_plural = 'Лента'
+        ordering = ('-recipe_id',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_feed_entry_user_recipe'
+            )
+        ]
+
+
+class RecipeNeighbour(models.Model):
+    """Похожие рецепты, рассчитанные командой compute_similar_recipes"""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='neighbours',
+        verbose_name='Рецепт',
+    )
+    neighbour = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Похожий рецепт',
+    )
+    score = models.FloatField(verbose_name='Сходство')
+    computed_at = models.DateTimeField(verbose_name='Дата расчета')
+
+    class Meta:
+        verbose_name = 'похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        ordering = ('recipe_id', '-score')
+        indexes = [
+            models.Index(
+                fields=['recipe', '-score'],
+                name='recipe_neighbour_score_idx'
+            )
+        ]
+
+
+class RecipeScore(models.Model):
+    """Популярность рецептов, рассчитанная командой compute_recipe_scores"""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='score',
+        verbose_name='Рецепт',
+    )
+    trending = models.FloatField(
+        default=0, db_index=True, verbose_name='Текущая популярность'
+    )
+    popular = models.PositiveIntegerField(
+        default=0, db_index=True, verbose_name='Добавлений в избранное'
+    )
+    computed_at = models.DateTimeField(verbose_name='Дата расчета')
+
+    class Meta:
+        verbose_name = 'популярность рецепта'
+        verbose_name_plural = 'Популярность рецептов'
+        ordering = ('-trending',)
+
+
+class ChangeLogEntryQuerySet(models.QuerySet):
+    def visible(self):
+        """Записи транзакций, раньше которых ничего уже не закоммитится.
+
+        Транзакция с меньшим xid, закоммиченная позже, не появится
+        перед курсором клиента, который уже прочитал более поздние записи.
+        """
+        return self.filter(xid__lt=RawSQL(
+            'txid_snapshot_xmin(txid_current_snapshot())', []
+        ))
+
+    def relevant_to(self, user_id):
+        return self.filter(
+            models.Q(user_id__isnull=True) | models.Q(user_id=user_id)
+        )
+
+    def compact(self, before):
+        """Удаляет замененные более поздними записи и старые удаления.
+
+        Возвращает число удаленных записей обоих видов.
+        """
+        table = self.model._meta.db_table
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                f"""
+                DELETE FROM {table} old USING {table} new
+                WHERE new.kind = old.kind
+                    AND new.object_id = old.object_id
+                    AND new.user_id IS NOT DISTINCT FROM old.user_id
+                    AND (new.xid, new.id) > (old.xid, old.id)
+                """
+            )
+            superseded = cursor.rowcount
+        expired, _ = self.filter(
+            action=self.model.DELETE, created__lt=before
+        ).delete()
+        return superseded, expired
+
+
+class ChangeLogEntry(models.Model):
+    """Журнал изменений для синхронизации клиентов.
+
+    Записи добавляют триггеры базы данных (миграция 0006), поэтому в
+    журнал попадают и изменения, сделанные через bulk_create и SQL.
+    Для рецептов user пуст: их изменения нужны всем клиентам.
+    """
+
+    RECIPE = 'recipe'
+    FAVORITE = 'favorite'
+    SHOPPING_CART = 'shopping_cart'
+    SUBSCRIPTION = 'subscription'
+    KINDS = (
+        (RECIPE, 'Рецепт'),
+        (FAVORITE, 'Избранное'),
+        (SHOPPING_CART, 'Список покупок'),
+        (SUBSCRIPTION, 'Подписка'),
+    )
+    INSERT = 'insert'
+    UPDATE = 'update'
+    DELETE = 'delete'
+    ACTIONS = (
+        (INSERT, 'Добавление'),
+        (UPDATE, 'Изменение'),
+        (DELETE, 'Удаление'),
+    )
+
+    kind = models.CharField(
+        max_length=const.CHANGE_KIND_MAX_LENGTH,
+        choices=KINDS,
+        verbose_name='Тип объекта'
+    )
+    action = models.CharField(
+        max_length=const.CHANGE_ACTION_MAX_LENGTH,
+        choices=ACTIONS,
+        verbose_name='Действие'
+    )
+    object_id = models.BigIntegerField(verbose_name='id объекта')
+    user = models.ForeignKey(
+        User,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        related_name='+',
+        verbose_name='Пользователь',
+    )
+    xid = models.BigIntegerField(verbose_name='Транзакция')
+    created = models.DateTimeField(verbose_name='Дата изменения')
+
+    objects = ChangeLogEntryQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'изменение'
+        verbose_name_plural = 'Журнал изменений'
+        ordering = ('xid', 'id')
+        indexes = [
+            models.Index(fields=['xid', 'id'], name='change_cursor_idx'),
+            models.Index(
+                fields=['kind', 'object_id'], name='change_object_idx'
+            ),
+        ]
@@ -0,0 +1,213 @@
+import logging
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import connection
+from django.utils import timezone
+
+import backend.constants as const
+
+from .models import Recipe, RecipeIngredient
+
+logger = logging.getLogger(__name__)
+
+
+class PantryIndexNotReady(Exception):
+    pass
+
+
+class PantryIndex:
+    """Инвертированный индекс ингредиент -> позиции рецептов.
+
+    Рецепт занимает позицию, у каждого ингредиента хранится
+    отсортированный массив позиций его рецептов (array, 4 байта на
+    позицию). При перестройке позиции идут по возрастанию id; рецепт,
+    измененный после нее, получает новую позицию в конце, а старая
+    помечается пустой (размер 0) и пропускается до следующей перестройки.
+
+    Индекс строится и обновляется фоновым потоком (start), запросы
+    только читают его.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.thread = None
+        self.built_at = None
+        self.updated_at = None
+
+    def start(self):
+        """Запускает фоновое обновление индекса (один поток на процесс)"""
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.run, name='pantry-index', daemon=True
+                )
+                self.thread.start()
+
+    def run(self):
+        while True:
+            try:
+                self.update()
+            except Exception:
+                logger.exception('Не удалось обновить индекс ингредиентов')
+            finally:
+                connection.close()
+            time.sleep(const.PANTRY_INDEX_REFRESH_INTERVAL)
+
+    def update(self):
+        """Перестраивает индекс раз в час, в остальное время дополняет"""
+        if (
+            self.built_at is None
+            or time.monotonic() - self.built_at
+            > const.PANTRY_INDEX_REBUILD_INTERVAL
+        ):
+            self.build()
+        else:
+            self.refresh()
+        self.ready.set()
+
+    def build(self):
+        started_at = timezone.now()
+        recipe_ids = array('q')
+        sizes = array('H')
+        postings = defaultdict(lambda: array('I'))
+        rows = RecipeIngredient.objects.order_by(
+            'recipe_id'
+        ).values_list('recipe_id', 'ingredient_id').iterator()
+        for recipe_id, ingredient_id in rows:
+            if not recipe_ids or recipe_ids[-1] != recipe_id:
+                recipe_ids.append(recipe_id)
+                sizes.append(0)
+            sizes[-1] += 1
+            postings[ingredient_id].append(len(recipe_ids) - 1)
+
+        with self.lock:
+            self.recipe_ids = recipe_ids
+            self.sizes = sizes
+            self.postings = dict(postings)
+            self.built_count = len(recipe_ids)
+            self.appended = {}
+            self.built_at = time.monotonic()
+            self.updated_at = started_at
+
+    def position(self, recipe_id):
+        if recipe_id in self.appended:
+            return self.appended[recipe_id]
+        position = bisect_left(self.recipe_ids, recipe_id, 0, self.built_count)
+        if (
+            position < self.built_count
+            and self.recipe_ids[position] == recipe_id
+        ):
+            return position
+        return None
+
+    def discard(self, recipe_id):
+        """Убирает рецепт из индекса (позиция остается пустой)"""
+        position = self.position(recipe_id)
+        if position is not None:
+            self.sizes[position] = 0
+
+    def remove(self, recipe_id):
+        with self.lock:
+            if self.built_at is not None:
+                self.discard(recipe_id)
+
+    def put(self, recipe_id, ingredient_ids):
+        self.discard(recipe_id)
+        if not ingredient_ids:
+            return
+        position = len(self.recipe_ids)
+        self.recipe_ids.append(recipe_id)
+        self.sizes.append(len(ingredient_ids))
+        self.appended[recipe_id] = position
+        for ingredient_id in ingredient_ids:
+            self.postings.setdefault(
+                ingredient_id, array('I')
+            ).append(position)
+
+    def refresh(self):
+        """Применяет изменения рецептов, сделанные после прошлой проверки.
+
+        updated_at сдвигается только после успешного обновления, так что
+        прерванная проверка повторится целиком.
+        """
+        started_at = timezone.now()
+        changed = list(Recipe.objects.filter(
+            updated__gte=self.updated_at - timedelta(
+                seconds=const.PANTRY_INDEX_REFRESH_LAG
+            )
+        ).order_by('id').values_list('id', flat=True))
+        ingredients = defaultdict(set)
+        for recipe_id, ingredient_id in RecipeIngredient.objects.filter(
+            recipe_id__in=changed
+        ).values_list('recipe_id', 'ingredient_id'):
+            ingredients[recipe_id].add(ingredient_id)
+        with self.lock:
+            for recipe_id in changed:
+                self.put(recipe_id, ingredients[recipe_id])
+            self.updated_at = started_at
+
+    def match(self, ingredient_ids):
+        """Рецепты, отсортированные по доле имеющихся ингредиентов"""
+        if not self.ready.is_set():
+            self.start()
+            if not self.ready.wait(const.PANTRY_INDEX_WARMUP_TIMEOUT):
+                raise PantryIndexNotReady
+        with self.lock:
+            counts = Counter()
+            for ingredient_id in set(ingredient_ids):
+                counts.update(self.postings.get(ingredient_id, ()))
+            return PantryMatch(counts, self.sizes, self.recipe_ids)
+
+
+class PantryMatch:
+    """Ленивый результат подбора, совместимый с Paginator.
+
+    Кандидаты группируются по числу имеющихся ингредиентов и размеру
+    рецепта; внутри группы рецепты сортируются по убыванию id только
+    при выдаче страницы, на которую попадает группа.
+    """
+
+    def __init__(self, counts, sizes, recipe_ids):
+        self.recipe_ids = recipe_ids
+        self.groups = defaultdict(list)
+        for position, have in counts.items():
+            size = sizes[position]
+            if size:
+                self.groups[have, size].append(position)
+        self.count = sum(len(group) for group in self.groups.values())
+        self.buckets = sorted(
+            self.groups,
+            key=lambda bucket: (-bucket[0] / bucket[1], bucket[1] - bucket[0])
+        )
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, item):
+        skip = item.start or 0
+        limit = item.stop - skip
+        result = []
+        for have, size in self.buckets:
+            group = self.groups[have, size]
+            if skip >= len(group):
+                skip -= len(group)
+                continue
+            recipe_ids = sorted(
+                (self.recipe_ids[position] for position in group),
+                reverse=True
+            )
+            for recipe_id in recipe_ids[skip:skip + limit - len(result)]:
+                result.append((recipe_id, have / size, size - have))
+            skip = 0
+            if len(result) >= limit:
+                break
+        return result
+
+
+pantry_index = PantryIndex()
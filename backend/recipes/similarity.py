@@ -0,0 +1,88 @@
+import heapq
+import math
+from collections import defaultdict
+
+import backend.constants as const
+
+_index = None
+
+
+class SimilarityIndex:
+    """Разреженная матрица рецепт × ингредиент с инвертированным индексом"""
+
+    def __init__(self, recipe_ingredients, recipe_tags):
+        self.ingredients = defaultdict(set)
+        self.tags = defaultdict(set)
+        for recipe_id, ingredient_id in recipe_ingredients:
+            self.ingredients[recipe_id].add(ingredient_id)
+        for recipe_id, tag_id in recipe_tags:
+            self.tags[recipe_id].add(tag_id)
+
+        self.postings = defaultdict(list)
+        for recipe_id, ingredient_ids in self.ingredients.items():
+            for ingredient_id in ingredient_ids:
+                self.postings[ingredient_id].append(recipe_id)
+
+        recipes_count = len(self.ingredients) or 1
+        self.weights = {
+            ingredient_id: math.log(1 + recipes_count / len(recipe_ids))
+            for ingredient_id, recipe_ids in self.postings.items()
+        }
+        self.totals = {
+            recipe_id: sum(self.weights[i] for i in ingredient_ids)
+            for recipe_id, ingredient_ids in self.ingredients.items()
+        }
+
+    def related(self, recipe_ids):
+        """Рецепты, у которых рецепты recipe_ids могут оказаться соседями"""
+        related = set()
+        for recipe_id in recipe_ids:
+            for ingredient_id in self.ingredients.get(recipe_id, ()):
+                candidates = self.postings[ingredient_id]
+                if len(candidates) <= const.SIMILARITY_MAX_POSTINGS:
+                    related.update(candidates)
+        return related
+
+    def neighbours(self, recipe_id, count):
+        """Взвешенный коэффициент Жаккара по ингредиентам и тегам"""
+        intersections = defaultdict(float)
+        for ingredient_id in self.ingredients.get(recipe_id, ()):
+            recipe_ids = self.postings[ingredient_id]
+            if len(recipe_ids) > const.SIMILARITY_MAX_POSTINGS:
+                continue
+            weight = self.weights[ingredient_id]
+            for candidate_id in recipe_ids:
+                intersections[candidate_id] += weight
+        intersections.pop(recipe_id, None)
+
+        total = self.totals.get(recipe_id, 0)
+        tags = self.tags.get(recipe_id, set())
+        scores = []
+        for candidate_id, intersection in intersections.items():
+            ingredient_score = intersection / (
+                total + self.totals[candidate_id] - intersection
+            )
+            candidate_tags = self.tags.get(candidate_id, set())
+            tag_union = len(tags | candidate_tags)
+            tag_score = (
+                len(tags & candidate_tags) / tag_union if tag_union else 0
+            )
+            scores.append((
+                (1 - const.SIMILARITY_TAG_WEIGHT) * ingredient_score
+                + const.SIMILARITY_TAG_WEIGHT * tag_score,
+                candidate_id
+            ))
+        return heapq.nlargest(count, scores)
+
+
+def init_worker(index):
+    global _index
+    _index = index
+
+
+def compute_batch(recipe_ids, count):
+    """Соседи для пачки рецептов (выполняется в дочернем процессе)"""
+    return [
+        (recipe_id, _index.neighbours(recipe_id, count))
+        for recipe_id in recipe_ids
+    ]
@@ -1,10 +1,12 @@
 from django.contrib import admin
 
+from backend.admin import LargeTableAdmin
+
 from .models import User, UserSubscription
 
 
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
+class UserAdmin(LargeTableAdmin):
     list_display = (
         "username",
         "email",
@@ -15,9 +17,17 @@ class UserAdmin(admin.ModelAdmin):
 
 
 @admin.register(UserSubscription)
-class UserSubscriptionAdmin(admin.ModelAdmin):
+class UserSubscriptionAdmin(LargeTableAdmin):
     list_display = (
         'id',
         'user',
         'subscription',
     )
+    list_select_related = (
+        'user',
+        'subscription',
+    )
+    autocomplete_fields = (
+        'user',
+        'subscription',
+    )
@@ -1,5 +1,5 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import connections, models
 
 import backend.constants as const
 
@@ -43,6 +43,29 @@ class User(AbstractUser):
         return self.username
 
 
+class UserSubscriptionQuerySet(models.QuerySet):
+    def subscribe(self, user_id, subscription_id):
+        """Создает подписку, False - если она уже была"""
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {self.model._meta.db_table} "
+                "(user_id, subscription_id) VALUES (%s, %s) "
+                "ON CONFLICT DO NOTHING RETURNING id",
+                [user_id, subscription_id]
+            )
+            return cursor.fetchone() is not None
+
+    def unsubscribe(self, user_id, subscription_id):
+        """Удаляет подписку, False - если ее не было"""
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {self.model._meta.db_table} "
+                "WHERE user_id = %s AND subscription_id = %s RETURNING id",
+                [user_id, subscription_id]
+            )
+            return cursor.fetchone() is not None
+
+
 class UserSubscription(models.Model):
     """Подписки пользователей"""
 
@@ -59,6 +82,8 @@ class UserSubscription(models.Model):
         verbose_name='Подписка',
     )
 
+    objects = UserSubscriptionQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'подписка'
         verbose_name_plural = 'Подписки'